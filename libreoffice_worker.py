@@ -0,0 +1,88 @@
+"""Drives one long-lived soffice over UNO on behalf of slide_api's LibreOffice pool.
+
+Runs under a Python that ships the UNO bridge (the system python3 with python3-uno, or
+the Python bundled with LibreOffice), which is usually not the interpreter serving the API.
+It connects to the soffice listening on the pipe named on the command line, then answers
+one JSON request per stdin line with one JSON reply per stdout line:
+
+    {"op": "ping"}                              -> {"ok": true}
+    {"op": "convert", "src": ..., "dst": ...}   -> {"ok": true} or {"ok": false, "error": ...}
+
+The first line it writes reports whether the connection succeeded. Closing stdin
+terminates soffice and exits.
+
+Usage: python3 libreoffice_worker.py <pipe name> <connect timeout seconds>
+"""
+import json
+import sys
+import time
+
+import uno
+from com.sun.star.beans import PropertyValue
+
+
+def connect(pipe_name, timeout):
+    """Returns the soffice Desktop once soffice accepts connections on ``pipe_name``."""
+    local_context = uno.getComponentContext()
+    resolver = local_context.ServiceManager.createInstanceWithContext(
+        "com.sun.star.bridge.UnoUrlResolver", local_context
+    )
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            context = resolver.resolve(f"uno:pipe,name={pipe_name};urp;StarOffice.ComponentContext")
+            return context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.25)
+
+
+def convert(desktop, src, dst):
+    """Converts the presentation at ``src`` to a PDF at ``dst``."""
+    document = desktop.loadComponentFromURL(
+        uno.systemPathToFileUrl(src), "_blank", 0, (PropertyValue("Hidden", 0, True, 0),)
+    )
+    try:
+        document.storeToURL(
+            uno.systemPathToFileUrl(dst), (PropertyValue("FilterName", 0, "impress_pdf_Export", 0),)
+        )
+    finally:
+        document.close(True)
+
+
+def reply(**message):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def main():
+    pipe_name, timeout = sys.argv[1], float(sys.argv[2])
+    try:
+        desktop = connect(pipe_name, timeout)
+    except Exception as e:
+        reply(ok=False, error=f"Could not connect to soffice: {e}")
+        return 1
+    reply(ok=True)
+
+    for line in sys.stdin:
+        try:
+            request = json.loads(line)
+            if request["op"] == "convert":
+                convert(desktop, request["src"], request["dst"])
+            else:
+                # A round trip to soffice proves it is still responsive
+                desktop.getComponents()
+            reply(ok=True)
+        except Exception as e:
+            reply(ok=False, error=str(e))
+
+    try:
+        desktop.terminate()
+    except Exception:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
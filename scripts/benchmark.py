@@ -0,0 +1,682 @@
+#!/usr/bin/env python3
+"""Offline benchmark and load test for slide_api.py.
+
+Starts local stand-ins for OpenAI, Pexels, the image CDN, LibreOffice and pdftoppm, launches the API
+under uvicorn pointed at them, drives every endpoint at a configurable concurrency for each
+template in TEMPLATE_PATHS, and writes a JSON report with throughput, p50/p95/p99 latency,
+peak memory and the per-stage breakdown scraped from /metrics.
+
+Usage (from the repository root):
+
+    python scripts/benchmark.py --requests 20 --concurrency 4 --output bench.json
+    python scripts/benchmark.py --templates aura,big-bold --endpoints generate_slide_with_template
+    python scripts/benchmark.py --baseline bench.json --fail-on-regression 15 \\
+        --server-env PPTX_BUILD_BACKEND=process
+
+Mock chat completions are synthesized from the prompt (configs are built from the layout
+table in the system prompt, so they are valid for every template). Recorded responses can be
+replayed instead with --recordings, a JSON object mapping a prompt kind ("outline",
+"content_outline", "config", "slide_config") to a list of message contents used in turn.
+"""
+
+import argparse
+import ast
+import hashlib
+import http.server
+import io
+import itertools
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image
+from pptx import Presentation
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Endpoints run once per template, and endpoints that do not take a template
+TEMPLATE_ENDPOINTS = ["generate_slide_with_template", "generate_slide_with_template/stream", "jobs/generate_slide_with_template"]
+GLOBAL_ENDPOINTS = [
+    "generate_outline", "generate_outline/stream", "generate_slide", "generate_batch",
+    "convert_to_pdf", "jobs/generate_slide", "jobs/convert_to_pdf", "preview",
+]
+
+LAYOUT_ROW = re.compile(r"^\s*(L\d+)\|[^|]*\|(.*)$", re.MULTILINE)
+
+SAMPLE_OUTLINES = [
+    {"title": "Introduction", "content": ["Why this topic matters today.", "What the audience will learn."]},
+    {"title": "Market Overview", "content": ["Market size and growth.", "Key players and trends.", "Customer segments."]},
+    {"title": "Our Approach", "content": ["Core idea and differentiation.", "How it works in practice."]},
+    {"title": "Results", "content": ["Measured outcomes so far.", "Lessons learned."]},
+    {"title": "Conclusion", "content": ["Summary of the key points.", "Next steps."]},
+]
+
+FAKE_LIBREOFFICE = '''#!{python}
+import os, sys, time
+args = sys.argv[1:]
+if "--version" in args:
+    print("LibreOffice 0.0 (benchmark stand-in)")
+    sys.exit(0)
+time.sleep(float(os.environ.get("BENCH_LIBREOFFICE_LATENCY", "0")))
+out_dir = args[args.index("--outdir") + 1]
+name = os.path.splitext(os.path.basename(args[-1]))[0] + ".pdf"
+with open(os.path.join(out_dir, name), "wb") as f:
+    f.write(b"%PDF-1.4\\n1 0 obj<<>>endobj\\ntrailer<<>>\\n%%EOF\\n")
+'''
+
+# Renders any requested page as a flat image at the requested width, like
+# `pdftoppm -png -singlefile -scale-to-x W -scale-to-y -1 <pdf> <prefix>`
+FAKE_PDFTOPPM = '''#!{python}
+import os, sys, time
+from PIL import Image
+args = sys.argv[1:]
+time.sleep(float(os.environ.get("BENCH_PDFTOPPM_LATENCY", "0")))
+width = int(args[args.index("-scale-to-x") + 1])
+Image.new("RGB", (width, width * 9 // 16), (70, 110, 160)).save(args[-1] + ".png")
+'''
+
+# Each /preview request asks for a deck variant of its own, so thumbnails are rendered rather than served from cache
+preview_variants = itertools.count()
+
+
+# ---------------------------------------------------------------------------
+# Mock upstream services
+# ---------------------------------------------------------------------------
+
+def prompt_kind(system_prompt):
+    if "lays out one slide" in system_prompt:
+        return "slide_config"
+    if "JSON configuration for a PowerPoint" in system_prompt:
+        return "config"
+    if "presentation outlines" in system_prompt:
+        return "outline"
+    return "content_outline"
+
+def synthesize_slide(layouts, index, title):
+    """Builds one slide for the index-th layout, filling every placeholder of that layout."""
+    layout_id, cells = layouts[index % len(layouts)]
+    placeholders = {}
+    for cell in cells.split():
+        idx, code = cell.split(":")
+        placeholders[idx] = f"{title} office teamwork" if code == "P" else f"{title}: benchmark text for placeholder {idx}"
+    return {"layout": layout_id, "placeholders": placeholders}
+
+def synthesize_content(kind, system_prompt, user_prompt):
+    """Produces a plausible model answer for the prompt, valid for whichever template it describes."""
+    if kind == "outline":
+        count = int((re.search(r"Number of slides: (\d+)", user_prompt) or [None, 5])[1])
+        slides = [SAMPLE_OUTLINES[i % len(SAMPLE_OUTLINES)] for i in range(count)]
+        return json.dumps({"slides": slides})
+    if kind == "content_outline":
+        return "\n".join(f"Slide: {o['title']}\n" + "\n".join(f"- {c}" for c in o["content"]) for o in SAMPLE_OUTLINES)
+
+    layouts = LAYOUT_ROW.findall(system_prompt) or [("L0", "0:T")]
+    if kind == "slide_config":
+        match = re.search(r"Slide (\d+) of", user_prompt)
+        index = int(match.group(1)) - 1 if match else 0
+        title = (re.search(r"^Slide: (.*)$", user_prompt, re.MULTILINE) or [None, "Slide"])[1]
+        return json.dumps(synthesize_slide(layouts, index, title))
+    titles = re.findall(r"^Slide: (.*)$", user_prompt, re.MULTILINE) or [o["title"] for o in SAMPLE_OUTLINES]
+    return json.dumps({"slides": [synthesize_slide(layouts, i, title) for i, title in enumerate(titles)]})
+
+
+def sample_deck(template_path, slide_count):
+    """Builds a deck of ``slide_count`` titled slides on the template, served as /files/deck.pptx."""
+    prs = Presentation(template_path)
+    for i in range(slide_count):
+        outline = SAMPLE_OUTLINES[i % len(SAMPLE_OUTLINES)]
+        slide = prs.slides.add_slide(prs.slide_layouts[i % len(prs.slide_layouts)])
+        if slide.shapes.title is not None:
+            slide.shapes.title.text = outline["title"]
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
+
+
+class MockState:
+    def __init__(self, args, recordings):
+        self.args = args
+        self.recordings = {kind: itertools.cycle(items) for kind, items in recordings.items() if items}
+        self.lock = threading.Lock()
+        self.calls = {}
+        image = Image.new("RGB", (args.image_width, args.image_height), (70, 110, 160))
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=90)
+        self.image = buffer.getvalue()
+        self.pptx = sample_deck(os.path.join(REPO_ROOT, "public/templates/aura.pptx"), args.slides)
+        self.variants = {}
+
+    def pptx_variant(self, variant):
+        """Returns the sample deck with a comment naming ``variant`` in every slide, so its slides hash as new."""
+        with self.lock:
+            if variant in self.variants:
+                return self.variants[variant]
+        source = zipfile.ZipFile(io.BytesIO(self.pptx))
+        output = io.BytesIO()
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as target:
+            for item in source.infolist():
+                data = source.read(item.filename)
+                if re.fullmatch(r"ppt/slides/slide\d+\.xml", item.filename):
+                    data = re.sub(rb"(<p:sld\b[^>]*>)", rb"\1<!-- variant %d -->" % variant, data, count=1)
+                target.writestr(item, data)
+        with self.lock:
+            self.variants[variant] = output.getvalue()
+            return self.variants[variant]
+
+    def count(self, name):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def content_for(self, kind, system_prompt, user_prompt):
+        with self.lock:
+            recorded = self.recordings.get(kind)
+            if recorded is not None:
+                return next(recorded)
+        return synthesize_content(kind, system_prompt, user_prompt)
+
+
+class MockHandler(http.server.BaseHTTPRequestHandler):
+    """Serves OpenAI (/v1/chat/completions, /v1/embeddings), Pexels (/v1/search), images and a PPTX file."""
+
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def do_GET(self):
+        args = self.state.args
+        if self.path.startswith("/v1/search"):
+            self.state.count("pexels_search")
+            time.sleep(args.pexels_latency)
+            query = requests.utils.unquote(self.path.partition("query=")[2].partition("&")[0])
+            photo = hashlib.sha1(query.encode()).hexdigest()[:12]
+            base = f"http://{self.headers['Host']}"
+            self._send(json.dumps({"photos": [{"src": {"large": f"{base}/images/{photo}.jpg"}}]}).encode(), "application/json")
+        elif self.path.startswith("/images/"):
+            self.state.count("image_download")
+            time.sleep(args.image_latency)
+            self._send(self.state.image, "image/jpeg")
+        elif self.path.startswith("/files/"):
+            variant = self.path.partition("variant=")[2]
+            pptx = self.state.pptx_variant(int(variant)) if variant else self.state.pptx
+            self._send(pptx, "application/vnd.openxmlformats-officedocument.presentationml.presentation")
+        else:
+            self._send(b"not found", "text/plain", 404)
+
+    def do_POST(self):
+        args = self.state.args
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.endswith("/embeddings"):
+            self.state.count("embeddings")
+            text = body["input"] if isinstance(body["input"], str) else " ".join(body["input"])
+            vector = [float(text.count(ch)) for ch in "abcdefghijklmnopqrstuvwxyz "]
+            payload = {"object": "list", "data": [{"object": "embedding", "index": 0, "embedding": vector}],
+                       "model": body.get("model", "mock"), "usage": {"prompt_tokens": len(text) // 4, "total_tokens": len(text) // 4}}
+            self._send(json.dumps(payload).encode(), "application/json")
+            return
+        if not self.path.endswith("/chat/completions"):
+            self._send(b"not found", "text/plain", 404)
+            return
+
+        messages = body.get("messages", [])
+        system_prompt = messages[0]["content"] if messages else ""
+        user_prompt = messages[-1]["content"] if len(messages) > 1 else ""
+        kind = prompt_kind(system_prompt)
+        self.state.count(f"openai_{kind}")
+        content = self.state.content_for(kind, system_prompt, user_prompt)
+        usage = {"prompt_tokens": (len(system_prompt) + len(user_prompt)) // 4, "completion_tokens": len(content) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        model = body.get("model", "mock")
+        time.sleep(args.openai_latency)
+
+        if not body.get("stream"):
+            payload = {"id": "bench", "object": "chat.completion", "created": int(time.time()), "model": model,
+                       "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                       "usage": usage}
+            self._send(json.dumps(payload).encode(), "application/json")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        base = {"id": "bench", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        for start in range(0, len(content), args.stream_chunk_chars):
+            delta = {"index": 0, "delta": {"content": content[start:start + args.stream_chunk_chars]}, "finish_reason": None}
+            self._chunk("data: " + json.dumps({**base, "choices": [delta]}) + "\n\n")
+            time.sleep(args.openai_chunk_delay)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._chunk("data: " + json.dumps({**base, "choices": [], "usage": usage}) + "\n\n")
+        self._chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_mock_server(state):
+    handler = type("BoundMockHandler", (MockHandler,), {"state": state})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---------------------------------------------------------------------------
+# API server under test
+# ---------------------------------------------------------------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_api_server(args, mock_url, work_dir):
+    fake_libreoffice = os.path.join(work_dir, "fake-libreoffice")
+    with open(fake_libreoffice, "w") as f:
+        f.write(FAKE_LIBREOFFICE.format(python=sys.executable))
+    os.chmod(fake_libreoffice, 0o755)
+    fake_pdftoppm = os.path.join(work_dir, "fake-pdftoppm")
+    with open(fake_pdftoppm, "w") as f:
+        f.write(FAKE_PDFTOPPM.format(python=sys.executable))
+    os.chmod(fake_pdftoppm, 0o755)
+
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": f"{mock_url}/v1",
+        "PEXELS_API_KEY": "benchmark",
+        "PEXELS_API_URL": f"{mock_url}/v1/search",
+        "LIBREOFFICE_PATH": fake_libreoffice,
+        # The stand-in only handles one-shot conversions, so keep the UNO-driven warm workers off
+        "LIBREOFFICE_PYTHON": "",
+        "BENCH_LIBREOFFICE_LATENCY": str(args.libreoffice_latency),
+        "PDFTOPPM_PATH": fake_pdftoppm,
+        "BENCH_PDFTOPPM_LATENCY": str(args.pdftoppm_latency),
+        "IMAGE_CACHE_DIR": os.path.join(work_dir, "image-cache"),
+        "LLM_CACHE_PATH": os.path.join(work_dir, "llm-cache.sqlite3"),
+        "LLM_CACHE_ENABLED": "true" if args.llm_cache else "false",
+        # /generate_slide uses TEMPLATE_PATH; point it at a shipped template unless one is configured
+        "TEMPLATE_PATH": os.environ.get("TEMPLATE_PATH", "public/templates/aura.pptx"),
+    }
+    for assignment in args.server_env:
+        key, _, value = assignment.partition("=")
+        env[key] = value
+
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "slide_api:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env,
+        stdout=subprocess.DEVNULL if not args.server_logs else None,
+        stderr=subprocess.DEVNULL if not args.server_logs else None,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API server exited during start-up with code {process.returncode}")
+        try:
+            # /ready turns 200 once the lifespan warm-up has finished
+            if requests.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("API server did not become ready in time")
+
+def read_proc_status(pid, field):
+    """Returns a /proc/<pid>/status memory field (e.g. VmHWM) in bytes, or None where unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def reset_peak_memory(pid):
+    """Resets VmHWM so the next reading is the peak for one scenario (Linux 4.0+)."""
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+# ---------------------------------------------------------------------------
+# Metrics scraping
+# ---------------------------------------------------------------------------
+
+METRIC_LINE = re.compile(r'^slidex_span_duration_seconds_(sum|count)\{span="([^"]+)"\} ([0-9.eE+-]+)$')
+
+def scrape_spans(base_url):
+    """Returns {span: {"sum": seconds, "count": n}} from the API's /metrics."""
+    spans = {}
+    for line in requests.get(f"{base_url}/metrics", timeout=10).text.splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            field, name, value = match.groups()
+            spans.setdefault(name, {"sum": 0.0, "count": 0})[field] = float(value)
+    return spans
+
+def span_delta(before, after):
+    stages = {}
+    for name, totals in after.items():
+        previous = before.get(name, {"sum": 0.0, "count": 0})
+        count = int(totals["count"] - previous["count"])
+        if count:
+            seconds = totals["sum"] - previous["sum"]
+            stages[name] = {"count": count, "total_s": round(seconds, 4), "mean_s": round(seconds / count, 4)}
+    return stages
+
+
+# ---------------------------------------------------------------------------
+# Scenarios
+# ---------------------------------------------------------------------------
+
+def deck_request(template_id, args, title="Benchmark deck"):
+    outlines = [SAMPLE_OUTLINES[i % len(SAMPLE_OUTLINES)] for i in range(args.slides)]
+    return {"title": title, "outlines": outlines, "templateId": template_id, "language": "English",
+            "configMode": args.config_mode, "regenerate": not args.llm_cache}
+
+def wait_for_job(session, base_url, submitted):
+    job_id = submitted.json()["job_id"]
+    while True:
+        status = session.get(f"{base_url}/jobs/{job_id}", timeout=30).json()
+        if status["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.05)
+    if status["status"] == "failed":
+        raise RuntimeError(status.get("error") or "job failed")
+    result = session.get(f"{base_url}/jobs/{job_id}/result", timeout=60)
+    result.raise_for_status()
+    return len(result.content)
+
+def run_one(session, base_url, mock_url, endpoint, template_id, args):
+    """Performs one request of a scenario and returns the response size in bytes."""
+    url = f"{base_url}/{endpoint}"
+    if endpoint in ("generate_slide_with_template", "generate_slide_with_template/stream"):
+        response = session.post(url, json=deck_request(template_id, args), timeout=args.request_timeout)
+        response.raise_for_status()
+        if endpoint.endswith("/stream"):
+            # The NDJSON stream ends with a done event pointing at the stored deck
+            last_event = json.loads(response.content.strip().splitlines()[-1])
+            if last_event.get("event") != "done":
+                raise RuntimeError(last_event.get("detail") or "stream did not finish")
+            result = session.get(f"{base_url}{last_event['result_url']}", timeout=args.request_timeout)
+            result.raise_for_status()
+            return len(result.content)
+        return len(response.content)
+    if endpoint == "jobs/generate_slide_with_template":
+        submitted = session.post(url, json=deck_request(template_id, args), timeout=args.request_timeout)
+        submitted.raise_for_status()
+        return wait_for_job(session, base_url, submitted)
+    if endpoint in ("generate_outline", "generate_outline/stream"):
+        payload = {"prompt": "The future of renewable energy", "slideCount": args.slides, "language": "English",
+                   "regenerate": not args.llm_cache}
+        response = session.post(url, json=payload, timeout=args.request_timeout)
+        response.raise_for_status()
+        return len(response.content)
+    if endpoint == "generate_slide":
+        payload = {"content": "The future of renewable energy", "regenerate": not args.llm_cache}
+        response = session.post(url, json=payload, timeout=args.request_timeout)
+        response.raise_for_status()
+        return len(response.content)
+    if endpoint == "jobs/generate_slide":
+        payload = {"content": "The future of renewable energy", "regenerate": not args.llm_cache}
+        submitted = session.post(url, json=payload, timeout=args.request_timeout)
+        submitted.raise_for_status()
+        return wait_for_job(session, base_url, submitted)
+    if endpoint == "generate_batch":
+        items = [deck_request(t, args, f"Batch deck {i}") for i, t in enumerate(args.available_templates[:args.batch_size])]
+        response = session.post(url, json={"items": items, "mode": "zip"}, timeout=args.request_timeout)
+        response.raise_for_status()
+        return len(response.content)
+    if endpoint in ("convert_to_pdf", "jobs/convert_to_pdf"):
+        payload = {"file_url": f"{mock_url}/files/deck.pptx"}
+        response = session.post(url, json=payload, timeout=args.request_timeout)
+        response.raise_for_status()
+        return wait_for_job(session, base_url, response) if endpoint.startswith("jobs/") else len(response.content)
+    if endpoint == "preview":
+        payload = {"file_url": f"{mock_url}/files/deck.pptx?variant={next(preview_variants)}", "width": 320}
+        response = session.post(url, json=payload, timeout=args.request_timeout)
+        response.raise_for_status()
+        # The NDJSON stream ends with a done event once every thumbnail is rendered
+        last_event = json.loads(response.content.strip().splitlines()[-1])
+        if last_event.get("event") != "done":
+            raise RuntimeError(last_event.get("detail") or "preview did not finish")
+        return len(response.content)
+    raise ValueError(f"unknown endpoint {endpoint}")
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[rank]
+
+def run_scenario(base_url, mock_url, server_pid, endpoint, template_id, args):
+    """Runs args.requests requests of one endpoint/template at args.concurrency."""
+    spans_before = scrape_spans(base_url)
+    peak_reset = reset_peak_memory(server_pid)
+    latencies, errors, sizes = [], [], []
+    local = threading.local()
+
+    def task(_):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            sizes.append(run_one(local.session, base_url, mock_url, endpoint, template_id, args))
+            latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            errors.append(str(e)[:200])
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(task, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "endpoint": endpoint,
+        "template": template_id,
+        "requests": args.requests,
+        "completed": len(latencies),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:3],
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "latency_s": {
+            "mean": round(statistics.fmean(latencies), 4) if latencies else None,
+            "p50": round(percentile(latencies, 50), 4) if latencies else None,
+            "p95": round(percentile(latencies, 95), 4) if latencies else None,
+            "p99": round(percentile(latencies, 99), 4) if latencies else None,
+            "max": round(max(latencies), 4) if latencies else None,
+        },
+        "response_bytes_mean": int(statistics.fmean(sizes)) if sizes else None,
+        "peak_rss_bytes": read_proc_status(server_pid, "VmHWM"),
+        "peak_rss_scope": "scenario" if peak_reset else "process",
+        "stages": span_delta(spans_before, scrape_spans(base_url)),
+    }
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Baseline comparison
+# ---------------------------------------------------------------------------
+
+def compare_to_baseline(report, baseline, threshold_pct):
+    """Pairs scenarios with the baseline run and flags p95 or throughput regressions beyond the threshold."""
+    previous = {(s["endpoint"], s["template"]): s for s in baseline.get("scenarios", [])}
+    rows = []
+    regressions = []
+    for scenario in report["scenarios"]:
+        key = (scenario["endpoint"], scenario["template"])
+        old = previous.get(key)
+        if not old or not old["latency_s"]["p95"] or not scenario["latency_s"]["p95"]:
+            continue
+        p95_change = (scenario["latency_s"]["p95"] / old["latency_s"]["p95"] - 1) * 100
+        rps_change = (scenario["throughput_rps"] / old["throughput_rps"] - 1) * 100 if old["throughput_rps"] else None
+        row = {"endpoint": key[0], "template": key[1], "p95_change_pct": round(p95_change, 1),
+               "throughput_change_pct": round(rps_change, 1) if rps_change is not None else None}
+        if old.get("peak_rss_bytes") and scenario.get("peak_rss_bytes"):
+            row["peak_rss_change_pct"] = round((scenario["peak_rss_bytes"] / old["peak_rss_bytes"] - 1) * 100, 1)
+        rows.append(row)
+        if threshold_pct is not None and (p95_change > threshold_pct or (rps_change is not None and rps_change < -threshold_pct)):
+            regressions.append(row)
+    return {"baseline_started_at": baseline.get("meta", {}).get("started_at"), "scenarios": rows, "regressions": regressions}
+
+
+def load_template_paths():
+    """Reads TEMPLATE_PATHS from slide_api.py without importing it (and creating its clients)."""
+    with open(os.path.join(REPO_ROOT, "slide_api.py")) as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "TEMPLATE_PATHS" for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise RuntimeError("TEMPLATE_PATHS not found in slide_api.py")
+
+def parse_args(argv=None):
+    TEMPLATE_PATHS = load_template_paths()
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--templates", default="all", help="comma-separated template IDs (default: all in TEMPLATE_PATHS)")
+    parser.add_argument("--endpoints", default="all", help="comma-separated endpoints (default: all)")
+    parser.add_argument("--requests", type=int, default=10, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--slides", type=int, default=5, help="slides per generated deck")
+    parser.add_argument("--batch-size", type=int, default=4, help="decks per /generate_batch request")
+    parser.add_argument("--config-mode", choices=["single", "fanout"], default=None)
+    parser.add_argument("--llm-cache", action="store_true", help="let the API serve repeat prompts from its LLM cache")
+    parser.add_argument("--openai-latency", type=float, default=0.5, help="seconds before a completion starts")
+    parser.add_argument("--openai-chunk-delay", type=float, default=0.005, help="seconds between streamed chunks")
+    parser.add_argument("--stream-chunk-chars", type=int, default=16)
+    parser.add_argument("--pexels-latency", type=float, default=0.15)
+    parser.add_argument("--image-latency", type=float, default=0.1)
+    parser.add_argument("--image-width", type=int, default=1920)
+    parser.add_argument("--image-height", type=int, default=1280)
+    parser.add_argument("--libreoffice-latency", type=float, default=1.0)
+    parser.add_argument("--pdftoppm-latency", type=float, default=0.05, help="seconds per rasterized preview page")
+    parser.add_argument("--recordings", help="JSON file of recorded completion contents per prompt kind")
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE", help="extra API environment")
+    parser.add_argument("--server-logs", action="store_true", help="show the API server's output")
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--request-timeout", type=float, default=300)
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--fail-on-regression", type=float, metavar="PCT",
+                        help="exit 1 if any p95 rises or throughput falls by more than PCT percent vs. the baseline")
+    args = parser.parse_args(argv)
+
+    args.templates = list(TEMPLATE_PATHS) if args.templates == "all" else args.templates.split(",")
+    args.endpoints = TEMPLATE_ENDPOINTS + GLOBAL_ENDPOINTS if args.endpoints == "all" else args.endpoints.split(",")
+    unknown = set(args.endpoints) - set(TEMPLATE_ENDPOINTS + GLOBAL_ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    args.template_paths = TEMPLATE_PATHS
+    args.available_templates = [
+        t for t in args.templates if t in TEMPLATE_PATHS and os.path.exists(os.path.join(REPO_ROOT, TEMPLATE_PATHS[t]))
+    ]
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    recordings = {}
+    if args.recordings:
+        with open(args.recordings) as f:
+            recordings = json.load(f)
+
+    state = MockState(args, recordings)
+    mock_server = start_mock_server(state)
+    mock_url = f"http://127.0.0.1:{mock_server.server_address[1]}"
+
+    report = {
+        "meta": {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "cpu_count": os.cpu_count(),
+            "options": {key: value for key, value in vars(args).items()
+                        if key not in ("template_paths", "available_templates", "baseline", "output")},
+        },
+        "skipped": [],
+        "scenarios": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="slidex-bench-") as work_dir:
+        process, base_url = start_api_server(args, mock_url, work_dir)
+        try:
+            report["meta"]["server_idle_rss_bytes"] = read_proc_status(process.pid, "VmRSS")
+            report["meta"]["server_startup_s"] = requests.get(f"{base_url}/ready", timeout=10).json()["startup"]
+            scenarios = []
+            for endpoint in args.endpoints:
+                if endpoint in TEMPLATE_ENDPOINTS:
+                    for template_id in args.templates:
+                        if template_id in args.available_templates:
+                            scenarios.append((endpoint, template_id))
+                        else:
+                            report["skipped"].append({"endpoint": endpoint, "template": template_id,
+                                                      "reason": "template file missing on disk"})
+                else:
+                    scenarios.append((endpoint, None))
+
+            for endpoint, template_id in scenarios:
+                result = run_scenario(base_url, mock_url, process.pid, endpoint, template_id, args)
+                report["scenarios"].append(result)
+                print(
+                    f"{endpoint:<38} {template_id or '-':<24} {result['throughput_rps']:>7.2f} req/s  "
+                    f"p50 {result['latency_s']['p50'] or 0:.3f}s  p95 {result['latency_s']['p95'] or 0:.3f}s  "
+                    f"p99 {result['latency_s']['p99'] or 0:.3f}s  errors {result['errors']}",
+                    file=sys.stderr,
+                )
+            report["meta"]["server_peak_rss_bytes"] = read_proc_status(process.pid, "VmHWM")
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            mock_server.shutdown()
+    report["upstream_calls"] = dict(state.calls)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare_to_baseline(report, json.load(f), args.fail_on_regression)
+        for row in report["comparison"]["regressions"]:
+            print(f"REGRESSION {row['endpoint']} {row['template'] or '-'}: p95 {row['p95_change_pct']:+.1f}%, "
+                  f"throughput {row['throughput_change_pct']:+.1f}%", file=sys.stderr)
+        if report["comparison"]["regressions"]:
+            exit_code = 1
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,54 @@
-from fastapi.middleware.cors import CORSMiddleware
+import time
+
+# Module import time is reported as the "import" startup phase
+_import_started = time.perf_counter()
+
 import os
 import io
 import json
+import asyncio
+import cProfile
+import hashlib
+import importlib
+import math
+import multiprocessing
 import logging
 import subprocess
 import tempfile
 import platform
+import pstats
+import queue
+import random
+import re
+import select
+import shutil
+import sqlite3
+import threading
+import uuid
+import zipfile
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar, copy_context
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from multiprocessing import shared_memory
 from dotenv import load_dotenv
 from pptx import Presentation
 from pptx.enum.shapes import PP_PLACEHOLDER
-from openai import OpenAI
-import requests
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.util import Emu
+from PIL import Image, ImageOps
+
+# openai and httpx are imported on first use (see open_async_clients()), and the LibreOffice
+# UNO bridge only ever loads in the libreoffice_worker.py helpers; the lifespan warm-up
+# touches each of them before the instance reports ready.
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from starlette.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 
 # Load environment variables from .env file
 load_dotenv()
@@ -25,13 +59,166 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY", ""))
+# The whole request path runs on the event loop: OpenAI and outbound HTTP are awaited instead of
+# holding a thread for the whole wait, while SQLite/disk cache access, the CPU-bound deck build
+# and LibreOffice conversions are offloaded with asyncio.to_thread. Jobs and batches run the
+# same coroutines as tasks on the serving loop.
+
+# Shared AsyncOpenAI client and pooled httpx client (Pexels, images and downloads), created by
+# open_async_clients(); rate-limit and transient-error retries are handled by call_openai()
+async_openai = None
+async_http = None
+
+def open_async_clients():
+    """Creates the shared AsyncOpenAI client, pooled httpx client and LLM/image semaphores (once per event loop)."""
+    global async_openai, async_http, image_fetch_slots, llm_slots
+    import httpx
+    from openai import AsyncOpenAI
+    if async_http is None:
+        async_http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=ASYNC_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=ASYNC_HTTP_MAX_KEEPALIVE,
+            ),
+            timeout=IMAGE_FETCH_TIMEOUT,
+            follow_redirects=True,
+        )
+    if async_openai is None:
+        async_openai = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY", ""), max_retries=0)
+    if image_fetch_slots is None:
+        image_fetch_slots = asyncio.Semaphore(IMAGE_GLOBAL_CONCURRENCY)
+    if llm_slots is None:
+        llm_slots = asyncio.Semaphore(LLM_CONCURRENCY)
+
+async def close_async_clients():
+    global async_openai, async_http, image_fetch_slots, llm_slots
+    if async_http is not None:
+        await async_http.aclose()
+    if async_openai is not None:
+        await async_openai.close()
+    async_openai = async_http = image_fetch_slots = llm_slots = None
 
 # Get Pexels API key and template paths
 PEXELS_API_KEY = os.environ.get("PEXELS_API_KEY", "")
 DEFAULT_TEMPLATE_PATH = os.environ.get("TEMPLATE_PATH", "pitch.pptx")
 
+# Memory cap for the pool of pre-loaded template bytes
+TEMPLATE_POOL_MAX_BYTES = int(os.environ.get("TEMPLATE_POOL_MAX_BYTES", str(128 * 1024 * 1024)))
+
+# Image fetching: concurrent fetches per deck, across all requests, and per-fetch timeout (seconds)
+IMAGE_FETCH_CONCURRENCY = int(os.environ.get("IMAGE_FETCH_CONCURRENCY", "8"))
+IMAGE_GLOBAL_CONCURRENCY = int(os.environ.get("IMAGE_GLOBAL_CONCURRENCY", "32"))
+IMAGE_FETCH_TIMEOUT = float(os.environ.get("IMAGE_FETCH_TIMEOUT", "15"))
+
+# Pexels search endpoint (overridable so a local stub can stand in for Pexels offline)
+PEXELS_API_URL = os.environ.get("PEXELS_API_URL", "https://api.pexels.com/v1/search")
+
+# Persistent image cache: query -> photo URL with a TTL, and URL -> image bytes on disk
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "slidex-image-cache"))
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+IMAGE_CACHE_MEMORY_BYTES = int(os.environ.get("IMAGE_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+PEXELS_QUERY_TTL = int(os.environ.get("PEXELS_QUERY_TTL", str(7 * 24 * 3600)))
+PEXELS_EMPTY_QUERY_TTL = int(os.environ.get("PEXELS_EMPTY_QUERY_TTL", "3600"))
+
+# Image normalization: pictures are cropped and downscaled to their placeholder at this DPI
+IMAGE_NORMALIZE = os.environ.get("IMAGE_NORMALIZE", "true").lower() == "true"
+IMAGE_TARGET_DPI = int(os.environ.get("IMAGE_TARGET_DPI", "150"))
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", "82"))
+
+# LibreOffice conversion pool: worker count, recycling, timeouts (seconds) and where worker profiles live
+LIBREOFFICE_WORKERS = int(os.environ.get("LIBREOFFICE_WORKERS", "2"))
+LIBREOFFICE_MAX_JOBS_PER_WORKER = int(os.environ.get("LIBREOFFICE_MAX_JOBS_PER_WORKER", "50"))
+LIBREOFFICE_CONVERT_TIMEOUT = float(os.environ.get("LIBREOFFICE_CONVERT_TIMEOUT", "60"))
+LIBREOFFICE_QUEUE_TIMEOUT = float(os.environ.get("LIBREOFFICE_QUEUE_TIMEOUT", "120"))
+LIBREOFFICE_MAX_WAITING = int(os.environ.get("LIBREOFFICE_MAX_WAITING", "32"))
+LIBREOFFICE_PROFILE_DIR = os.environ.get(
+    "LIBREOFFICE_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "slidex-libreoffice")
+)
+
+# Slide previews: pdftoppm rasterizes the warm pool's PDF output; thumbnails are cached by slide content hash
+PDFTOPPM_PATH = os.environ.get("PDFTOPPM_PATH", "pdftoppm")
+PREVIEW_WIDTHS = [int(width) for width in os.environ.get("PREVIEW_WIDTHS", "160,320,640,1280,1920").split(",")]
+PREVIEW_MAX_SLIDES = int(os.environ.get("PREVIEW_MAX_SLIDES", "100"))
+PREVIEW_WEBP_QUALITY = int(os.environ.get("PREVIEW_WEBP_QUALITY", "80"))
+PREVIEW_MEDIA_TYPES = {"png": "image/png", "webp": "image/webp"}
+
+# Background jobs: jobs running at once, maximum queued jobs, and how long results are kept (seconds)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_QUEUE_MAX = int(os.environ.get("JOB_QUEUE_MAX", "100"))
+JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", "3600"))
+
+PPTX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+# Config generation: "single" asks for the whole deck in one call, "fanout" makes one call per outline slide
+CONFIG_MODE = os.environ.get("CONFIG_MODE", "single")
+CONFIG_FANOUT_MODEL = os.environ.get("CONFIG_FANOUT_MODEL", "gpt-4o-mini")
+CONFIG_FANOUT_CONCURRENCY = int(os.environ.get("CONFIG_FANOUT_CONCURRENCY", "8"))
+CONFIG_FANOUT_RETRIES = int(os.environ.get("CONFIG_FANOUT_RETRIES", "2"))
+
+# Deck sessions: the last per-slide configs of each deck, so a resubmitted deck only regenerates edited slides
+DECK_SESSION_TTL = int(os.environ.get("DECK_SESSION_TTL", str(24 * 3600)))
+DECK_SESSION_MAX = int(os.environ.get("DECK_SESSION_MAX", "1000"))
+
+# Streamed I/O: downloads and outputs spill to disk instead of being held in memory
+MAX_DOWNLOAD_BYTES = int(os.environ.get("MAX_DOWNLOAD_BYTES", str(100 * 1024 * 1024)))
+SPOOL_MAX_MEMORY_BYTES = int(os.environ.get("SPOOL_MAX_MEMORY_BYTES", str(8 * 1024 * 1024)))
+FILE_CHUNK_SIZE = 64 * 1024
+
+# Outbound HTTP: connection limits of the shared httpx client used for Pexels, images and downloads
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.environ.get("ASYNC_HTTP_MAX_CONNECTIONS", "200"))
+ASYNC_HTTP_MAX_KEEPALIVE = int(os.environ.get("ASYNC_HTTP_MAX_KEEPALIVE", "50"))
+
+# Admission control: concurrent requests per endpoint class, how many may wait for a slot, and for how long
+ADMISSION_GENERATION_CONCURRENCY = int(os.environ.get("ADMISSION_GENERATION_CONCURRENCY", "32"))
+ADMISSION_GENERATION_QUEUE = int(os.environ.get("ADMISSION_GENERATION_QUEUE", "64"))
+ADMISSION_CONVERSION_CONCURRENCY = int(os.environ.get("ADMISSION_CONVERSION_CONCURRENCY", "8"))
+ADMISSION_CONVERSION_QUEUE = int(os.environ.get("ADMISSION_CONVERSION_QUEUE", "16"))
+ADMISSION_WAIT_TIMEOUT = float(os.environ.get("ADMISSION_WAIT_TIMEOUT", "30"))
+ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", "5"))
+
+# Upstream limits: in-flight LLM calls, token-bucket rates (requests/s, 0 disables) and retries on 429s
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "32"))
+OPENAI_RATE_LIMIT = float(os.environ.get("OPENAI_RATE_LIMIT", "20"))
+OPENAI_RATE_BURST = int(os.environ.get("OPENAI_RATE_BURST", "40"))
+PEXELS_RATE_LIMIT = float(os.environ.get("PEXELS_RATE_LIMIT", "5"))
+PEXELS_RATE_BURST = int(os.environ.get("PEXELS_RATE_BURST", "20"))
+UPSTREAM_MAX_RETRIES = int(os.environ.get("UPSTREAM_MAX_RETRIES", "3"))
+UPSTREAM_RETRY_BASE_DELAY = float(os.environ.get("UPSTREAM_RETRY_BASE_DELAY", "0.5"))
+UPSTREAM_RETRY_MAX_DELAY = float(os.environ.get("UPSTREAM_RETRY_MAX_DELAY", "20"))
+
+# Deck building backend: "thread" builds in the request thread, "process" on a pre-warmed process pool
+PPTX_BUILD_BACKEND = os.environ.get("PPTX_BUILD_BACKEND", "thread")
+PPTX_BUILD_PROCESSES = int(os.environ.get("PPTX_BUILD_PROCESSES", str(os.cpu_count() or 2)))
+
+# Startup: log each import/warm-up phase and the slowest warm-up calls (profiled) when set
+STARTUP_PROFILE = os.environ.get("STARTUP_PROFILE", "false").lower() in ("1", "true", "yes")
+
+# Batch generation: decks built concurrently per batch, and the largest accepted batch
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "100"))
+
+# LLM response cache: persistent exact-match store with TTL and entry cap, plus an optional
+# embedding-similarity tier for near-duplicate outline topics
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", os.path.join(tempfile.gettempdir(), "slidex-llm-cache.sqlite3"))
+LLM_CACHE_TTL = int(os.environ.get("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_SEMANTIC = os.environ.get("LLM_CACHE_SEMANTIC", "false").lower() == "true"
+LLM_CACHE_SEMANTIC_THRESHOLD = float(os.environ.get("LLM_CACHE_SEMANTIC_THRESHOLD", "0.95"))
+LLM_CACHE_EMBEDDING_MODEL = os.environ.get("LLM_CACHE_EMBEDDING_MODEL", "text-embedding-3-small")
+
+# USD per million (input, output) tokens, used to report what cache hits saved
+MODEL_PRICES = {
+    "gpt-4": (30.0, 60.0),
+    "gpt-4o-mini": (0.15, 0.60),
+    "text-embedding-3-small": (0.02, 0.0),
+}
+
+# Tracing and metrics: spans feed the /metrics histograms; span logging and payload logging are opt-in
+TRACE_LOG_SPANS = os.environ.get("TRACE_LOG_SPANS", "false").lower() in ("1", "true", "yes")
+PAYLOAD_LOG_SAMPLE_RATE = float(os.environ.get("PAYLOAD_LOG_SAMPLE_RATE", "0"))
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
 # Template mapping
 TEMPLATE_PATHS = {
     "aura":                         "public/templates/aura.pptx",
@@ -54,6 +241,126 @@ TEMPLATE_PATHS = {
     "vibrant-creative":             "public/templates/vibrant-creative.pptx",
 }
 
+class Metrics:
+    """In-process Prometheus registry with counters and fixed-bucket histograms, rendered at /metrics."""
+
+    def __init__(self, buckets=METRICS_BUCKETS):
+        self.buckets = buckets
+        self._help = {}
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def add_collector(self, collector):
+        """Registers a callable returning (name, labels, value) gauge samples read at scrape time."""
+        self._collectors.append(collector)
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: {**h, "buckets": list(h["buckets"])} for key, h in self._histograms.items()}
+        gauges = []
+        for collector in self._collectors:
+            try:
+                gauges.extend(collector())
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {e}")
+
+        lines = []
+        seen = set()
+
+        def header(name, default_kind):
+            if name not in seen:
+                seen.add(name)
+                kind, help_text = self._help.get(name, (default_kind, name))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{self._labels(labels)} {value:g}")
+        for (name, labels), histogram in sorted(histograms.items()):
+            header(name, "histogram")
+            for bound, count in zip(self.buckets, histogram["buckets"]):
+                lines.append(f"{name}_bucket{self._labels(labels, [('le', f'{bound:g}')])} {count}")
+            lines.append(f"{name}_bucket{self._labels(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{name}_sum{self._labels(labels)} {histogram['sum']:.6f}")
+            lines.append(f"{name}_count{self._labels(labels)} {histogram['count']}")
+        for name, labels, value in sorted(gauges, key=lambda sample: (sample[0], sorted(sample[1].items()))):
+            header(name, "gauge")
+            lines.append(f"{name}{self._labels(sorted(labels.items()))} {value:g}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+metrics.describe("slidex_span_duration_seconds", "histogram", "Duration of traced pipeline stages")
+metrics.describe("slidex_span_errors_total", "counter", "Traced stages that raised")
+metrics.describe("slidex_llm_tokens_total", "counter", "Tokens reported by OpenAI, by model and direction")
+metrics.describe("slidex_llm_cost_usd_total", "counter", "Estimated OpenAI spend")
+metrics.describe("slidex_http_request_duration_seconds", "histogram", "HTTP request latency by route")
+metrics.describe("slidex_http_requests_total", "counter", "HTTP requests by route and status")
+
+# Request-scoped trace id, set by the HTTP middleware and included in span logs
+current_trace_id = ContextVar("current_trace_id", default=None)
+
+@contextmanager
+def span(name, **attributes):
+    """Times a pipeline stage into slidex_span_duration_seconds{span=name}.
+
+    The yielded dict can be filled with attributes (token counts, sizes, cache status) that
+    are logged with the span when TRACE_LOG_SPANS is on.
+    """
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield attributes
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        metrics.observe("slidex_span_duration_seconds", duration, span=name)
+        if failed:
+            metrics.inc("slidex_span_errors_total", span=name)
+        if TRACE_LOG_SPANS:
+            details = " ".join(f"{key}={value}" for key, value in attributes.items())
+            logger.info(
+                f"span trace={current_trace_id.get() or '-'} name={name} "
+                f"duration_ms={duration * 1000:.1f} error={failed} {details}".rstrip()
+            )
+
+def payload_log_sampled():
+    """True for the PAYLOAD_LOG_SAMPLE_RATE fraction of calls that should log full prompts/responses."""
+    return PAYLOAD_LOG_SAMPLE_RATE > 0 and random.random() < PAYLOAD_LOG_SAMPLE_RATE
+
 def get_template_structure(template_path):
     """Extracts a brief structure of layouts and placeholders from a PowerPoint template, including image placeholders."""
     prs = Presentation(template_path)
@@ -91,50 +398,941 @@ def get_template_structure(template_path):
         structure["masters"].append(master_data)
     return structure
 
-def get_pexels_image_url(query, api_key):
-    """Fetches an image URL from Pexels based on the search query."""
-    if not api_key:
+# Placeholders the model should never fill; they are left out of prompts entirely
+NON_CONTENT_PLACEHOLDER_TYPES = {"Date", "Footer", "Slide Number"}
+
+PLACEHOLDER_TYPE_CODES = {
+    "Title": "T",
+    "Center Title": "C",
+    "Subtitle": "S",
+    "Body": "B",
+    "Header": "H",
+    "Picture": "P",
+}
+
+def estimate_tokens(text):
+    """Rough token count for prompt-size logging (about four characters per token)."""
+    return len(text) // 4
+
+def compact_template_structure(structure):
+    """Encodes a template structure as a terse layout table for prompts.
+
+    Non-content placeholders are dropped, layouts without fillable placeholders are skipped,
+    and layouts with identical placeholder signatures are listed once. Each row gets a short
+    layout ID; ``layouts`` maps that ID back to the real (master_idx, layout_idx).
+    """
+    rows = ["layout|name|placeholders as idx:type (T=Title C=Center Title S=Subtitle B=Body H=Header P=Picture)"]
+    layouts = {}
+    seen_signatures = set()
+    for master in structure["masters"]:
+        for layout in master["layouts"]:
+            placeholders = [
+                (ph["idx"], ph["type"]) for ph in layout["placeholders"]
+                if ph["type"] not in NON_CONTENT_PLACEHOLDER_TYPES
+            ]
+            signature = tuple(sorted(placeholders))
+            if not placeholders or signature in seen_signatures:
+                continue
+            seen_signatures.add(signature)
+            layout_id = f"L{len(layouts)}"
+            layouts[layout_id] = (master["master_idx"], layout["layout_idx"])
+            cells = " ".join(f"{idx}:{PLACEHOLDER_TYPE_CODES[ph_type]}" for idx, ph_type in placeholders)
+            rows.append(f"{layout_id}|{layout['name']}|{cells}")
+    text = "\n".join(rows)
+    return {
+        "structure": structure,
+        "text": text,
+        "layouts": layouts,
+        "tokens": estimate_tokens(text),
+        "full_tokens": estimate_tokens(json.dumps(structure, indent=2)),
+    }
+
+class TemplateCatalog:
+    """In-memory catalog of parsed template structures, keyed on template path.
+
+    Each entry is fingerprinted by the file's mtime and size and by a SHA-256 of its
+    contents, so a template is only re-parsed when the file on disk actually changes.
+    """
+
+    def __init__(self, template_paths):
+        self.template_paths = template_paths
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get_entry(self, template_path):
+        stat = os.stat(template_path)
+        fingerprint = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(template_path)
+            if entry and entry["fingerprint"] == fingerprint:
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        with open(template_path, "rb") as f:
+            data = f.read()
+        content_hash = hashlib.sha256(data).hexdigest()
+        if entry and entry["content_hash"] == content_hash:
+            # Touched but unchanged (e.g. re-copied on deploy): keep the parsed structure
+            structure, schema = entry["structure"], entry["schema"]
+        else:
+            logger.info(f"Parsing template structure: {template_path}")
+            with span("template_parse", template=os.path.basename(template_path)):
+                structure = get_template_structure(io.BytesIO(data))
+                schema = compact_template_structure(structure)
+            logger.info(
+                f"Prompt schema for {template_path}: ~{schema['tokens']} tokens "
+                f"(~{schema['full_tokens']} as indented JSON)"
+            )
+
+        entry = {
+            "fingerprint": fingerprint,
+            "content_hash": content_hash,
+            "structure": structure,
+            "schema": schema,
+        }
+        with self._lock:
+            self._entries[template_path] = entry
+        return entry
+
+    def get_structure(self, template_path):
+        """Returns the cached structure for a template, (re)building the entry if the file changed."""
+        return self._get_entry(template_path)["structure"]
+
+    def get_schema(self, template_path):
+        """Returns the precomputed compact prompt schema (see compact_template_structure) for a template."""
+        return self._get_entry(template_path)["schema"]
+
+    def warm(self):
+        """Parses every known template up front so the first requests are served from memory."""
+        for template_id, template_path in self.template_paths.items():
+            if not os.path.exists(template_path):
+                logger.warning(f"Template '{template_id}' is missing on disk: {template_path}")
+                continue
+            try:
+                self.get_structure(template_path)
+            except Exception as e:
+                logger.error(f"Error parsing template '{template_id}': {e}")
+
+    def list_templates(self):
+        """Lists the known templates with their availability and cache state."""
+        templates = []
+        for template_id, template_path in self.template_paths.items():
+            with self._lock:
+                entry = self._entries.get(template_path)
+            item = {
+                "id": template_id,
+                "path": template_path,
+                "available": os.path.exists(template_path),
+                "cached": entry is not None,
+            }
+            if entry:
+                item["content_hash"] = entry["content_hash"]
+                item["layouts"] = sum(len(m["layouts"]) for m in entry["structure"]["masters"])
+            templates.append(item)
+        return templates
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+template_catalog = TemplateCatalog(TEMPLATE_PATHS)
+
+class TemplatePool:
+    """LRU pool of slide-stripped template bytes, so each request builds a fresh Presentation without touching disk.
+
+    Any slides shipped inside a template are removed once when it is loaded, which leaves
+    only masters and layouts for the generated deck. The pool is capped at ``max_bytes``
+    and evicts the least recently used templates first.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_bytes(self, template_path):
+        """Returns the slide-stripped bytes of a template, loading it from disk on a miss or after a change."""
+        stat = os.stat(template_path)
+        fingerprint = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(template_path)
+            if entry and entry["fingerprint"] == fingerprint:
+                self._entries.move_to_end(template_path)
+                self.hits += 1
+                return entry["data"]
+            self.misses += 1
+
+        data = self._load_stripped(template_path)
+        with self._lock:
+            old = self._entries.pop(template_path, None)
+            if old:
+                self._size -= len(old["data"])
+            if len(data) <= self.max_bytes:
+                self._entries[template_path] = {"fingerprint": fingerprint, "data": data}
+                self._size += len(data)
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted["data"])
+                    self.evictions += 1
+        return data
+
+    def open(self, template_path):
+        """Returns a new, isolated Presentation built from the pooled template bytes."""
+        return Presentation(io.BytesIO(self.get_bytes(template_path)))
+
+    @staticmethod
+    def _load_stripped(template_path):
+        with open(template_path, "rb") as f:
+            data = f.read()
+        prs = Presentation(io.BytesIO(data))
+        if len(prs.slides) == 0:
+            return data
+        # Drop the template's own slides so generated decks contain only generated slides
+        sld_id_lst = prs.slides._sldIdLst
+        for sld_id in list(sld_id_lst):
+            prs.part.drop_rel(sld_id.rId)
+            sld_id_lst.remove(sld_id)
+        stripped = io.BytesIO()
+        prs.save(stripped)
+        return stripped.getvalue()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+template_pool = TemplatePool(TEMPLATE_POOL_MAX_BYTES)
+
+# The single limiter per stage: in-flight Pexels searches and image downloads across all
+# concurrent requests, and in-flight OpenAI calls (including streams and embeddings). Both are
+# created by open_async_clients() on the serving loop.
+image_fetch_slots = None
+llm_slots = None
+
+
+class Overloaded(HTTPException):
+    """A saturated stage turning work away; answered with ``status_code`` and a Retry-After hint."""
+
+    def __init__(self, detail, status_code=503, retry_after=ADMISSION_RETRY_AFTER):
+        super().__init__(status_code=status_code, detail=detail, headers={"Retry-After": str(retry_after)})
+
+
+class TokenBucket:
+    """Token-bucket rate limiter for calls to an upstream service.
+
+    Callers reserve a token and sleep until it is due, so a burst of ``burst`` calls goes
+    out at once and the rest are spread at ``rate`` per second. A rate of 0 disables it.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes a token and returns how long to wait (seconds) before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+openai_bucket = TokenBucket(OPENAI_RATE_LIMIT, OPENAI_RATE_BURST)
+pexels_bucket = TokenBucket(PEXELS_RATE_LIMIT, PEXELS_RATE_BURST)
+
+@lru_cache(maxsize=1)
+def retryable_openai_errors():
+    """Upstream failures worth retrying: rate limits, 5xx and connection errors/timeouts."""
+    from openai import APIConnectionError, InternalServerError, RateLimitError
+    return (RateLimitError, InternalServerError, APIConnectionError)
+
+def retry_after_seconds(headers):
+    """Returns a numeric Retry-After header in seconds, or None."""
+    value = (headers or {}).get("Retry-After") or (headers or {}).get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+def upstream_retry_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, honouring the upstream's Retry-After and capped at UPSTREAM_RETRY_MAX_DELAY."""
+    delay = random.uniform(0, UPSTREAM_RETRY_BASE_DELAY * 2 ** attempt)
+    if retry_after:
+        delay = max(delay, retry_after)
+    return min(delay, UPSTREAM_RETRY_MAX_DELAY)
+
+def openai_retry_delay(attempt, error):
+    """Returns how long to wait before retrying an OpenAI call, or None when ``error`` should be raised."""
+    if attempt >= UPSTREAM_MAX_RETRIES:
         return None
-    url = "https://api.pexels.com/v1/search"
-    headers = {"Authorization": api_key}
-    params = {"query": query, "per_page": 1}
+    response = getattr(error, "response", None)
+    delay = upstream_retry_delay(attempt, retry_after_seconds(getattr(response, "headers", None)))
+    metrics.inc("slidex_upstream_retries_total", upstream="openai", error=type(error).__name__)
+    logger.warning(f"OpenAI call failed ({type(error).__name__}); retrying in {delay:.2f}s")
+    return delay
+
+async def call_openai(create, **kwargs):
+    """Calls an OpenAI API method under the rate limit, retrying 429s and transient errors with jitter."""
+    for attempt in range(UPSTREAM_MAX_RETRIES + 1):
+        await openai_bucket.acquire()
+        try:
+            return await create(**kwargs)
+        except retryable_openai_errors() as e:
+            delay = openai_retry_delay(attempt, e)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+
+def pexels_retry_delay(attempt, response):
+    """Returns how long to wait before retrying a rate-limited Pexels search, or None to stop searching.
+
+    Long Retry-After values (an exhausted hourly or monthly quota) pause all searches instead.
+    """
+    global pexels_backoff_until
+    retry_after = retry_after_seconds(response.headers)
+    if attempt >= UPSTREAM_MAX_RETRIES or (retry_after or 0) > UPSTREAM_RETRY_MAX_DELAY:
+        pexels_backoff_until = time.time() + (retry_after or 60)
+        logger.error("Pexels rate limit reached; pausing searches")
+        return None
+    metrics.inc("slidex_upstream_retries_total", upstream="pexels", error="RateLimited")
+    return upstream_retry_delay(attempt, retry_after)
+
+
+class AdmissionGate:
+    """Caps the concurrent requests of one endpoint class, with a bounded wait queue.
+
+    Up to ``limit`` requests run at once and up to ``max_waiting`` more wait at most
+    ``wait_timeout`` seconds for a slot. Beyond that, requests are turned away at once with
+    a 429; waiters that time out get a 503. Both carry a Retry-After hint, so a burst
+    degrades into fast rejections instead of piling onto LLM, image and conversion stages.
+
+    Occupancy (``active + waiting``) is counted before the first await, so requests arriving
+    in the same event-loop tick see each other and a burst is cut at ``limit + max_waiting``.
+    """
+
+    def __init__(self, name, limit, max_waiting, wait_timeout):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._slots = None
+        self._loop = None
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.limit)
+            self._loop = loop
+        if self.active + self.waiting >= self.limit + self.max_waiting:
+            self.rejected += 1
+            raise Overloaded(f"Too many {self.name} requests, please retry later", status_code=429)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.wait_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise Overloaded(f"Timed out waiting for a {self.name} slot, please retry later")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+
+    def release(self):
+        self.active -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+admission_gates = {
+    "generation": AdmissionGate(
+        "generation", ADMISSION_GENERATION_CONCURRENCY, ADMISSION_GENERATION_QUEUE, ADMISSION_WAIT_TIMEOUT
+    ),
+    "conversion": AdmissionGate(
+        "conversion", ADMISSION_CONVERSION_CONCURRENCY, ADMISSION_CONVERSION_QUEUE, ADMISSION_WAIT_TIMEOUT
+    ),
+}
+
+# Endpoints that do expensive work inline and the gate that admits them; job endpoints are bounded by the job queue
+ADMISSION_ROUTES = {
+    "/generate_outline": "generation",
+    "/generate_outline/stream": "generation",
+    "/generate_slide": "generation",
+    "/generate_slide_with_template": "generation",
+    "/generate_slide_with_template/stream": "generation",
+    "/generate_batch": "generation",
+    "/convert_to_pdf": "conversion",
+    "/preview": "conversion",
+}
+
+CACHE_MISS = object()
+
+
+class ImageCache:
+    """Two-level cache for Pexels lookups and image bytes.
+
+    Search results (query -> photo URL, including "no result") are kept in SQLite with a
+    TTL. Downloaded images are stored on disk, content-addressed by SHA-256, with an LRU
+    size cap, and the most recently used images are also kept in an in-memory hot tier.
+    """
+
+    def __init__(self, cache_dir, max_bytes, memory_bytes):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self._hot = OrderedDict()
+        self._hot_size = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self.stats_counters = {
+            "query_hits": 0, "query_misses": 0, "image_hits": 0, "image_misses": 0,
+            "variant_hits": 0, "variant_misses": 0, "evictions": 0,
+        }
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(self.blob_dir, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.cache_dir, "index.sqlite3"), timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS queries (query TEXT PRIMARY KEY, url TEXT, expires_at REAL)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS blobs (url TEXT PRIMARY KEY, digest TEXT, size INTEGER, last_access REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access)")
+        return self._db
+
+    @staticmethod
+    def normalize_query(query):
+        return " ".join(query.lower().split())
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def get_url(self, query):
+        """Returns the cached photo URL (or None for a cached empty result), or CACHE_MISS."""
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT url, expires_at FROM queries WHERE query = ?", (self.normalize_query(query),)
+            ).fetchone()
+            if row and row[1] > time.time():
+                self.stats_counters["query_hits"] += 1
+                return row[0]
+            self.stats_counters["query_misses"] += 1
+            return CACHE_MISS
+
+    def put_url(self, query, url):
+        ttl = PEXELS_QUERY_TTL if url else PEXELS_EMPTY_QUERY_TTL
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                "INSERT OR REPLACE INTO queries (query, url, expires_at) VALUES (?, ?, ?)",
+                (self.normalize_query(query), url, time.time() + ttl),
+            )
+            db.commit()
+
+    def get_image(self, url, counter="image"):
+        """Returns the cached bytes for an image URL, or None.
+
+        Derived blobs (normalized variants) pass their own ``counter`` so they do not skew
+        the download hit ratio.
+        """
+        with self._lock:
+            db = self._conn()
+            row = db.execute("SELECT digest FROM blobs WHERE url = ?", (url,)).fetchone()
+            if not row:
+                self.stats_counters[f"{counter}_misses"] += 1
+                return None
+            digest = row[0]
+            db.execute("UPDATE blobs SET last_access = ? WHERE url = ?", (time.time(), url))
+            db.commit()
+            data = self._hot.get(digest)
+            if data is not None:
+                self._hot.move_to_end(digest)
+                self.stats_counters[f"{counter}_hits"] += 1
+                return data
+        try:
+            with open(self._blob_path(digest), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._conn().execute("DELETE FROM blobs WHERE url = ?", (url,))
+                self._conn().commit()
+                self.stats_counters[f"{counter}_misses"] += 1
+            return None
+        with self._lock:
+            self._remember(digest, data)
+            self.stats_counters[f"{counter}_hits"] += 1
+        return data
+
+    def put_image(self, url, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Build processes share the blob directory, so the temp name must be unique across processes
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except FileNotFoundError:
+                    pass
+                raise
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                "INSERT OR REPLACE INTO blobs (url, digest, size, last_access) VALUES (?, ?, ?, ?)",
+                (url, digest, len(data), time.time()),
+            )
+            db.commit()
+            self._remember(digest, data)
+            self._evict_disk()
+        return digest
+
+    def _remember(self, digest, data):
+        if digest in self._hot or len(data) > self.memory_bytes:
+            return
+        self._hot[digest] = data
+        self._hot_size += len(data)
+        while self._hot_size > self.memory_bytes:
+            _, evicted = self._hot.popitem(last=False)
+            self._hot_size -= len(evicted)
+
+    def _evict_disk(self):
+        db = self._conn()
+        # Several URLs may share one content-addressed blob; count each blob once
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM blobs)").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, digest, size in db.execute("SELECT url, digest, size FROM blobs ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            db.execute("DELETE FROM blobs WHERE url = ?", (url,))
+            if not db.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone():
+                try:
+                    os.remove(self._blob_path(digest))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if digest in self._hot:
+                    self._hot_size -= len(self._hot.pop(digest))
+            self.stats_counters["evictions"] += 1
+        db.commit()
+
+    def stats(self):
+        with self._lock:
+            return {**self.stats_counters, "memory_bytes": self._hot_size, "memory_entries": len(self._hot)}
+
+
+image_cache = ImageCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, IMAGE_CACHE_MEMORY_BYTES)
+
+# Pexels searches are paused until this time after a 429 (rate limited) response
+pexels_backoff_until = 0.0
+
+async def store_in_image_cache(store, *args):
+    """Writes to the image cache; a failed write is logged so the result in hand is still used."""
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if data["photos"]:
-                return data["photos"][0]["src"]["large"]
+        await asyncio.to_thread(store, *args)
+    except Exception as e:
+        logger.error(f"Error writing to the image cache: {e}")
+
+async def get_pexels_image_url(query, api_key):
+    """Fetches an image URL from Pexels based on the search query, using the image cache when possible.
+
+    Searches are rate limited by ``pexels_bucket``; a 429 is retried with jittered backoff.
+    Any failure, including an unavailable cache, returns None so only this picture is skipped.
+    """
+    try:
+        cached_url = await asyncio.to_thread(image_cache.get_url, query)
+        if cached_url is not CACHE_MISS:
+            return cached_url
+        if not api_key:
+            return None
+        if time.time() < pexels_backoff_until:
+            logger.warning(f"Skipping Pexels search while rate limited: {query}")
+            return None
+        open_async_clients()
+        headers = {"Authorization": api_key}
+        params = {"query": query, "per_page": 1}
+        for attempt in range(UPSTREAM_MAX_RETRIES + 1):
+            await pexels_bucket.acquire()
+            async with image_fetch_slots:
+                with span("pexels_search") as attributes:
+                    response = await async_http.get(PEXELS_API_URL, headers=headers, params=params)
+                    attributes["status"] = response.status_code
+            if response.status_code == 200:
+                data = response.json()
+                image_url = data["photos"][0]["src"]["large"] if data["photos"] else None
+                await store_in_image_cache(image_cache.put_url, query, image_url)
+                return image_url
+            if response.status_code != 429:
+                break
+            delay = pexels_retry_delay(attempt, response)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
     except Exception as e:
         logger.error(f"Error fetching from Pexels: {e}")
     return None
 
-def generate_content_outline(user_content):
-    """Generates a presentation content outline using OpenAI GPT based on user content."""
-    sys_prompt = """
+async def download_image(image_url):
+    """Downloads an image, serving it from the image cache when it was fetched before; returns None on failure."""
+    try:
+        data = await asyncio.to_thread(image_cache.get_image, image_url)
+        if data is not None:
+            return data
+        open_async_clients()
+        async with image_fetch_slots:
+            with span("image_download") as attributes:
+                response = await async_http.get(image_url)
+                attributes["status"] = response.status_code
+                attributes["bytes"] = len(response.content)
+        if response.status_code == 200:
+            await store_in_image_cache(image_cache.put_image, image_url, response.content)
+            return response.content
+        logger.error(f"Error downloading image {image_url}: HTTP {response.status_code}")
+    except Exception as e:
+        logger.error(f"Error downloading image {image_url}: {e}")
+    return None
+
+async def fetch_image(query):
+    """Resolves a Pexels search query and downloads the image, returning its bytes or None on failure."""
+    image_url = await get_pexels_image_url(query, PEXELS_API_KEY)
+    if not image_url:
+        return None
+    return await download_image(image_url)
+
+def normalize_image(image_bytes, width_emu, height_emu):
+    """Crops an image to a placeholder's aspect ratio and downsizes and re-encodes it for IMAGE_TARGET_DPI.
+
+    Results are cached by source hash and target size. Images that cannot be decoded are
+    returned unchanged, and images are never upscaled.
+    """
+    target_w = max(1, round(Emu(width_emu).inches * IMAGE_TARGET_DPI))
+    target_h = max(1, round(Emu(height_emu).inches * IMAGE_TARGET_DPI))
+    source_hash = hashlib.sha256(image_bytes).hexdigest()
+    cache_key = f"normalized:{source_hash}:{target_w}x{target_h}:q{IMAGE_JPEG_QUALITY}"
+    try:
+        cached = image_cache.get_image(cache_key, counter="variant")
+    except Exception as e:
+        logger.error(f"Error reading a normalized image from the cache: {e}")
+        cached = None
+    if cached is not None:
+        return cached
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img = ImageOps.exif_transpose(img)
+            # Centre-crop to the placeholder's aspect ratio
+            src_w, src_h = img.size
+            target_ratio = target_w / target_h
+            if src_w / src_h > target_ratio:
+                crop_w = round(src_h * target_ratio)
+                left = (src_w - crop_w) // 2
+                img = img.crop((left, 0, left + crop_w, src_h))
+            else:
+                crop_h = round(src_w / target_ratio)
+                top = (src_h - crop_h) // 2
+                img = img.crop((0, top, src_w, top + crop_h))
+            if img.width > target_w:
+                img = img.resize((target_w, target_h), Image.LANCZOS)
+
+            output = io.BytesIO()
+            if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+                img.save(output, "PNG", optimize=True)
+            else:
+                img.convert("RGB").save(output, "JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+    except Exception as e:
+        logger.error(f"Error normalizing image: {e}")
+        return image_bytes
+
+    data = output.getvalue()
+    try:
+        image_cache.put_image(cache_key, data)
+    except Exception as e:
+        # The normalized picture is still good; it just is not cached for next time
+        logger.error(f"Error caching a normalized image: {e}")
+    return data
+
+def collect_picture_queries(config):
+    """Returns the Pexels queries of every Picture placeholder in a presentation config, in order."""
+    queries = []
+    for slide_data in config["slides"]:
+        for ph_data in slide_data["placeholders"].values():
+            if ph_data.get("type") == "Picture" and ph_data.get("content"):
+                queries.append(ph_data["content"])
+    return queries
+
+def completion_cost(model, response):
+    """Estimates the USD cost of an OpenAI response from its reported token usage."""
+    usage = getattr(response, "usage", None)
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    if not usage:
+        return 0.0
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+def record_llm_usage(model, response, attributes=None):
+    """Adds a response's reported token usage and estimated cost to the LLM metrics."""
+    usage = getattr(response, "usage", None)
+    if not usage:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    metrics.inc("slidex_llm_tokens_total", prompt_tokens, model=model, direction="prompt")
+    metrics.inc("slidex_llm_tokens_total", completion_tokens, model=model, direction="completion")
+    metrics.inc("slidex_llm_cost_usd_total", completion_cost(model, response), model=model)
+    if attributes is not None:
+        attributes["prompt_tokens"] = prompt_tokens
+        attributes["completion_tokens"] = completion_tokens
+
+async def chat_completion(stage, **completion_args):
+    """Calls the chat completions API inside an ``llm_<stage>`` span and records its token usage."""
+    open_async_clients()
+    model = completion_args.get("model")
+    async with llm_slots:
+        with span(f"llm_{stage}", model=model) as attributes:
+            response = await call_openai(async_openai.chat.completions.create, **completion_args)
+            record_llm_usage(model, response, attributes)
+    return response
+
+
+class LLMCache:
+    """Persistent cache of LLM results keyed on a normalized hash of the request.
+
+    Keys cover the model, a hash of the system prompt (so any prompt or template change
+    invalidates old entries) and the whitespace-normalized user input; case is kept, since it
+    carries meaning in names and brands. Entries expire after LLM_CACHE_TTL and the least
+    recently used are evicted beyond LLM_CACHE_MAX_ENTRIES. With LLM_CACHE_SEMANTIC enabled,
+    case-folded outline topics are also matched by embedding similarity.
+    """
+
+    def __init__(self, path, ttl, max_entries):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._db = None
+        self._lock = threading.Lock()
+        self.stats_counters = {"hits": 0, "semantic_hits": 0, "misses": 0, "bypassed": 0, "saved_usd": 0.0}
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, kind TEXT, value TEXT, "
+                "cost REAL, expires_at REAL, last_access REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, scope TEXT, vector TEXT)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_scope ON embeddings (scope)")
+        return self._db
+
+    @staticmethod
+    def normalize(text):
+        return " ".join(str(text).split())
+
+    def make_key(self, kind, model, system_prompt, user_input):
+        prompt_version = hashlib.sha256(system_prompt.encode()).hexdigest()[:16]
+        payload = json.dumps([kind, model, prompt_version, self.normalize(user_input)])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """Returns the cached value for ``key`` or None, counting the hit or miss."""
+        with self._lock:
+            db = self._conn()
+            row = db.execute("SELECT value, cost, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if not row or row[2] < time.time():
+                self.stats_counters["misses"] += 1
+                return None
+            db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            db.commit()
+            self.stats_counters["hits"] += 1
+            self.stats_counters["saved_usd"] += row[1] or 0.0
+            return row[0]
+
+    def put(self, key, kind, value, cost):
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, kind, value, cost, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, value, cost, now + self.ttl, now),
+            )
+            count = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                db.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                db.execute("DELETE FROM embeddings WHERE key NOT IN (SELECT key FROM responses)")
+            db.commit()
+
+    def record_bypass(self):
+        with self._lock:
+            self.stats_counters["bypassed"] += 1
+
+    def get_similar(self, scope, vector):
+        """Semantic tier: returns the cached value whose embedding in ``scope`` is most similar to
+        ``vector``, or None when nothing is similar enough."""
+        with self._lock:
+            db = self._conn()
+            rows = db.execute(
+                "SELECT e.key, e.vector, r.value, r.cost FROM embeddings e JOIN responses r ON r.key = e.key "
+                "WHERE e.scope = ? AND r.expires_at > ?",
+                (scope, time.time()),
+            ).fetchall()
+            best = None
+            for key, stored, value, cost in rows:
+                similarity = cosine_similarity(vector, json.loads(stored))
+                if similarity >= LLM_CACHE_SEMANTIC_THRESHOLD and (best is None or similarity > best[0]):
+                    best = (similarity, key, value, cost)
+            if best is None:
+                return None
+            db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), best[1]))
+            db.commit()
+            self.stats_counters["semantic_hits"] += 1
+            self.stats_counters["saved_usd"] += best[3] or 0.0
+            return best[2]
+
+    def put_embedding(self, key, scope, vector):
+        if vector is None:
+            return
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                "INSERT OR REPLACE INTO embeddings (key, scope, vector) VALUES (?, ?, ?)", (key, scope, json.dumps(vector))
+            )
+            db.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.stats_counters)
+        # A semantic hit follows an exact-match miss, so misses already count every non-exact lookup
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["semantic_hits"]) / lookups, 4) if lookups else 0.0
+        stats["saved_usd"] = round(stats["saved_usd"], 6)
+        return stats
+
+
+def cosine_similarity(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+llm_cache = LLMCache(LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES)
+
+async def embed_topic(text):
+    """Returns the embedding of a case-folded outline topic for the semantic cache tier, or None on failure."""
+    open_async_clients()
+    try:
+        async with llm_slots:
+            with span("llm_embedding", model=LLM_CACHE_EMBEDDING_MODEL):
+                response = await call_openai(
+                    async_openai.embeddings.create, model=LLM_CACHE_EMBEDDING_MODEL,
+                    input=LLMCache.normalize(text).casefold()
+                )
+        return response.data[0].embedding
+    except Exception as e:
+        logger.error(f"Error embedding text for the LLM cache: {e}")
+        return None
+
+def cache_lookup(key, use_cache):
+    """Returns the cached value for ``key`` unless caching is disabled or bypassed for this request."""
+    if not LLM_CACHE_ENABLED:
+        return None
+    if not use_cache:
+        llm_cache.record_bypass()
+        return None
+    return llm_cache.get(key)
+
+def cache_store(key, kind, value, cost):
+    if LLM_CACHE_ENABLED:
+        llm_cache.put(key, kind, value, cost)
+
+CONTENT_OUTLINE_PROMPT = """
     You are Slidex, an expert AI assistant that generate high-quality content based on the provided content by user or user's query.
     your task is to generate, curate, edit, and finalize textual material for a excellent presentation.
     If the user provided you with prepaid content, try to edit or finalize the content as user asker.
     If user asked about some topic generate content.
     repsond only with final content, as a presentation outline.
     """
-    
+
+async def generate_content_outline(user_content, use_cache=True):
+    """Generates a presentation content outline using OpenAI GPT based on user content."""
+    cache_key = llm_cache.make_key("content_outline", "gpt-4o-mini", CONTENT_OUTLINE_PROMPT, user_content)
+    cached = await asyncio.to_thread(cache_lookup, cache_key, use_cache)
+    if cached is not None:
+        return cached
+
     try:
-        response = client.chat.completions.create(
+        response = await chat_completion(
+            "content_outline",
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": sys_prompt},
+                {"role": "system", "content": CONTENT_OUTLINE_PROMPT},
                 {"role": "user", "content": user_content}
             ],
             timeout=60
         )
-        return response.choices[0].message.content
+        content = response.choices[0].message.content
+        if content:
+            await asyncio.to_thread(
+                cache_store, cache_key, "content_outline", content, completion_cost("gpt-4o-mini", response)
+            )
+        return content
     except Exception as e:
         logger.error(f"Error generating content outline: {str(e)}")
         return None
 
-def generate_structured_outline(prompt: str, slide_count: int, language: str):
-    """Generates a structured presentation outline in JSON format using an AI model."""
-    
+def build_outline_prompts(prompt: str, slide_count: int, language: str):
+    """Builds the system and user prompts for structured outline generation."""
     system_prompt = f"""
 You are Slidex, an expert AI assistant that creates high-quality presentation outlines.
 
@@ -168,29 +1366,73 @@ Language: {language}
 
 Generate the JSON outline now.
 """
+    return system_prompt, user_prompt
+
+def outline_semantic_scope(system_prompt, slide_count, language):
+    """Near-duplicate topics only match outlines made with the same prompt, slide count and language."""
+    return llm_cache.make_key("outline", "gpt-4o-mini", system_prompt, f"{slide_count}|{language}")
+
+async def lookup_cached_outline(system_prompt, user_prompt, prompt, slide_count, language, use_cache):
+    """Returns (cached slides or None, cache key, topic embedding for storing a new entry)."""
+    cache_key = llm_cache.make_key("outline", "gpt-4o-mini", system_prompt, user_prompt)
+    cached = await asyncio.to_thread(cache_lookup, cache_key, use_cache)
+    if cached is not None:
+        return json.loads(cached), cache_key, None
+    vector = None
+    if LLM_CACHE_ENABLED and LLM_CACHE_SEMANTIC and use_cache:
+        vector = await embed_topic(prompt)
+        scope = outline_semantic_scope(system_prompt, slide_count, language)
+        cached = await asyncio.to_thread(llm_cache.get_similar, scope, vector) if vector is not None else None
+        if cached is not None:
+            if payload_log_sampled():
+                logger.info(f"Serving outline for a similar topic from the LLM cache: {prompt}")
+            return json.loads(cached), cache_key, None
+    return None, cache_key, vector
 
+def store_cached_outline(cache_key, vector, slides, cost, system_prompt, slide_count, language):
+    cache_store(cache_key, "outline", json.dumps(slides), cost)
+    if LLM_CACHE_ENABLED:
+        llm_cache.put_embedding(cache_key, outline_semantic_scope(system_prompt, slide_count, language), vector)
+
+def parse_outline_response(response_content):
+    """Returns the "slides" array of an outline response; raises JSONDecodeError/ValueError otherwise."""
+    json_data = json.loads(response_content)
+    
+    # The model should return {"slides": [...]}
+    if isinstance(json_data, dict) and "slides" in json_data and isinstance(json_data["slides"], list):
+        return json_data["slides"]
+    
+    raise ValueError("The AI response did not contain a valid 'slides' array.")
+
+async def generate_structured_outline(prompt: str, slide_count: int, language: str, use_cache=True):
+    """Generates a structured presentation outline in JSON format using an AI model."""
+    system_prompt, user_prompt = build_outline_prompts(prompt, slide_count, language)
+    cached, cache_key, vector = await lookup_cached_outline(system_prompt, user_prompt, prompt, slide_count, language, use_cache)
+    if cached is not None:
+        return cached
+
+    response_content = None
     try:
-        logger.info(f"Generating outline for topic: {prompt}")
-        response = client.chat.completions.create(
-            model="gpt-4o-mini", 
+        if payload_log_sampled():
+            logger.info(f"Generating outline for topic: {prompt}")
+        response = await chat_completion(
+            "outline",
+            model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
             response_format={"type": "json_object"}
         )
-        
         response_content = response.choices[0].message.content
-        logger.info(f"Raw AI response for outline: {response_content}")
-        
-        json_data = json.loads(response_content)
-        
-        # The model should return {"slides": [...]}
-        if isinstance(json_data, dict) and "slides" in json_data and isinstance(json_data["slides"], list):
-            return json_data["slides"]
-        
-        raise ValueError("The AI response did not contain a valid 'slides' array.")
-
+        if payload_log_sampled():
+            logger.info(f"Raw AI response for outline: {response_content}")
+        slides = parse_outline_response(response_content)
+        await asyncio.to_thread(
+            store_cached_outline, cache_key, vector, slides, completion_cost("gpt-4o-mini", response),
+            system_prompt, slide_count, language
+        )
+        return slides
     except json.JSONDecodeError as e:
         logger.error(f"Error decoding JSON from AI response: {e}")
         logger.error(f"Problematic response content: {response_content}")
@@ -200,15 +1442,15 @@ Generate the JSON outline now.
         return None
 
 
-def generate_presentation_config(content, template_structure):
-    """Generates a presentation configuration using OpenAI GPT based on content and template structure."""
+def build_config_prompt(schema):
+    """Builds the system prompt that asks the model for a full presentation config."""
     prompt = f"""
     You are an assistant that creates PowerPoint presentations based on a template and content.
 
-    Here is the structure of the PowerPoint template:
-    {json.dumps(template_structure, indent=2)}
+    Here are the layouts of the PowerPoint template, one per line:
+    {schema["text"]}
 
-    The template has multiple slide masters, each with several layouts. Each layout contains placeholders of different types, such as Title, Body, Picture, etc., identified by idx, id, name, and type.
+    Each layout has an ID (e.g. L0) and a list of placeholders, given as placeholder idx and type code.
 
     You would be provided with the presentation content's outline.
 
@@ -217,13 +1459,9 @@ def generate_presentation_config(content, template_structure):
     {{
       "slides": [
         {{
-          "master_idx": <master index>,
-          "layout_idx": <layout index within the master>,
+          "layout": "<layout ID>",
           "placeholders": {{
-            "<placeholder_idx>": {{
-              "type": "<placeholder_type>",
-              "content": "<text or search query>"
-            }},
+            "<placeholder idx>": "<text or search query>",
             ...
           }}
         }},
@@ -231,101 +1469,976 @@ def generate_presentation_config(content, template_structure):
       ]
     }}
 
-    For placeholders of type Title, Body, Center Title, Subtitle, Date, Footer, Header, Slide Number, provide the text to insert in 'content'.
+    For text placeholders (T, C, S, B, H), provide the text to insert.
 
-    For placeholders of type Picture, provide a search query for Pexels in 'content', which will be used to fetch an image from Pexels and insert it into the placeholder.
+    For Picture placeholders (P), provide a search query for Pexels, which will be used to fetch an image from Pexels and insert it into the placeholder.
 
     Ensure that:
     - The presentation uses a variety of layouts appropriately (e.g., title slide, content slides with text and images).
     - The content is split across multiple slides if necessary (aim for an optimume numder of slides using different layouts based on the content outline).
-    - Only text and picture placeholders are filled; other placeholders are ignored.
-    - The placeholder_idx matches the idx in the template structure.
+    - The placeholder idx values belong to the chosen layout.
     - For picture placeholders, provide meaningful search queries based on the content.
     """
+    return prompt
+
+def log_prompt_usage(label, schema, response):
+    """Logs the compact vs. uncompacted schema size and the token usage OpenAI reported."""
+    usage = getattr(response, "usage", None)
+    logger.info(
+        f"{label} prompt: schema ~{schema['tokens']} tokens (was ~{schema['full_tokens']}); "
+        f"usage prompt={getattr(usage, 'prompt_tokens', '?')} completion={getattr(usage, 'completion_tokens', '?')}"
+    )
+
+async def generate_presentation_config(content, schema, use_cache=True):
+    """Generates a presentation configuration using OpenAI GPT based on content and the template's compact schema.
+
+    The model answers in compact form; the returned JSON uses real master/layout/placeholder indices.
+    """
+    prompt = build_config_prompt(schema)
+    cache_key = llm_cache.make_key("config", "gpt-4", prompt, content)
+    cached = await asyncio.to_thread(cache_lookup, cache_key, use_cache)
+    if cached is not None:
+        return cached
 
     try:
-        response = client.chat.completions.create(
+        response = await chat_completion(
+            "config",
             model="gpt-4",
             messages=[
                 {"role": "system", "content": prompt},
                 {"role": "user", "content": content}
             ],
-            timeout=60  # 60 second timeout for OpenAI API
+            timeout=60
         )
-        return response.choices[0].message.content
+        log_prompt_usage("Config", schema, response)
+        config = json.loads(response.choices[0].message.content)
+        resolved = json.dumps({"slides": resolve_slide_configs(config["slides"], schema)})
+        await asyncio.to_thread(cache_store, cache_key, "config", resolved, completion_cost("gpt-4", response))
+        return resolved
     except Exception as e:
         logger.error(f"Error generating configuration: {str(e)}")
         return None
 
-def generate_pptx_from_config(template_path, json_config):
-    """Generates a PowerPoint file from the template and JSON configuration, including image insertion."""
-    prs = Presentation(template_path)
-    config = json.loads(json_config)
+def build_slide_config_prompt(schema):
+    """Builds the system prompt that asks the model for the config of a single slide."""
+    return f"""
+    You are an assistant that lays out one slide of a PowerPoint presentation based on a template.
 
-    for slide_data in config["slides"]:
-        master_idx = slide_data["master_idx"]
-        layout_idx = slide_data["layout_idx"]
-        placeholders_data = slide_data["placeholders"]
+    Here are the layouts of the PowerPoint template, one per line:
+    {schema["text"]}
 
-        master = prs.slide_masters[master_idx]
-        layout = master.slide_layouts[layout_idx]
-        slide = prs.slides.add_slide(layout)
-
-        for ph_idx_str, ph_data in placeholders_data.items():
-            ph_idx = int(ph_idx_str)
-            placeholder = next((shape for shape in slide.placeholders if shape.placeholder_format.idx == ph_idx), None)
-            if placeholder:
-                placeholder_type = ph_data["type"]
-                content = ph_data["content"]
-                if placeholder_type in ["Title", "Body", "Center Title", "Subtitle", "Date", "Footer", "Header", "Slide Number"]:
-                    placeholder.text = content
-                elif placeholder_type == "Picture":
-                    query = content
-                    image_url = get_pexels_image_url(query, PEXELS_API_KEY)
-                    if image_url:
-                        try:
-                            response = requests.get(image_url, stream=True, timeout=15)
-                            if response.status_code == 200:
-                                image_stream = io.BytesIO(response.content)
-                                placeholder.insert_picture(image_stream)
-                        except Exception as e:
-                            logger.error(f"Error inserting image: {e}")
-
-    pptx_bytes = io.BytesIO()
-    # Delete the first slide (redundant slide that is not used in template)
-    if len(prs.slides) > 0:
-        slide_id = prs.slides._sldIdLst[0].rId
-        prs.part.drop_rel(slide_id)
-        del prs.slides._sldIdLst[0]
+    Each layout has an ID (e.g. L0) and a list of placeholders, given as placeholder idx and type code.
 
-    
-    prs.save(pptx_bytes)
-    pptx_bytes.seek(0)
-    return pptx_bytes
+    You will be given one slide of the presentation outline, its position in the deck, and the titles of all slides for context.
 
-def get_libreoffice_path():
-    """Determines the path to the LibreOffice executable."""
-    if platform.system() == "Darwin":  # macOS
-        return "/opt/homebrew/bin/libreoffice"
-    elif platform.system() == "Linux":  # Ubuntu/Debian
-        return "/usr/bin/libreoffice"
-    else:  # Fallback for other systems
-        return "libreoffice"
+    Respond with ONLY a JSON object for that single slide, in this format:
 
-def check_libreoffice_installed():
-    """Check if LibreOffice is installed and accessible."""
-    libreoffice_path = get_libreoffice_path()
-    try:
-        if not os.path.exists(libreoffice_path) and libreoffice_path != "libreoffice":
-             return False
-        result = subprocess.run([libreoffice_path, "--version"], 
-                              capture_output=True, text=True, timeout=10)
+    {{
+      "layout": "<layout ID>",
+      "placeholders": {{
+        "<placeholder idx>": "<text or search query>",
+        ...
+      }}
+    }}
+
+    For text placeholders (T, C, S, B, H), provide the text to insert.
+
+    For Picture placeholders (P), provide a search query for Pexels.
+
+    Ensure that:
+    - The layout suits the slide's position (e.g., a title layout for the first slide) and content.
+    - The placeholder idx values belong to the chosen layout.
+    """
+
+def resolve_slide_config(slide_data, schema):
+    """Maps a compact slide config ({"layout": "L3", "placeholders": {"<idx>": "<content>"}}) back
+    to real master/layout indices and validates it against the template structure."""
+    if not isinstance(slide_data, dict):
+        raise ValueError("slide config must be an object")
+    layout_id = slide_data.get("layout")
+    if layout_id in schema["layouts"]:
+        master_idx, layout_idx = schema["layouts"][layout_id]
+    elif "master_idx" in slide_data and "layout_idx" in slide_data:
+        master_idx, layout_idx = slide_data["master_idx"], slide_data["layout_idx"]
+    else:
+        raise ValueError(f"unknown layout {layout_id!r}")
+    placeholders = slide_data.get("placeholders")
+    if isinstance(placeholders, dict):
+        placeholders = {
+            ph_idx: ph_data if isinstance(ph_data, dict) else {"content": ph_data}
+            for ph_idx, ph_data in placeholders.items()
+        }
+    return validate_slide_config(
+        {"master_idx": master_idx, "layout_idx": layout_idx, "placeholders": placeholders},
+        schema["structure"]
+    )
+
+def resolve_slide_configs(slides, schema):
+    """Resolves every slide of a compact config, skipping (and logging) slides that do not validate."""
+    resolved = []
+    for index, slide_data in enumerate(slides):
+        try:
+            resolved.append(resolve_slide_config(slide_data, schema))
+        except ValueError as e:
+            logger.error(f"Skipping invalid config for slide {index + 1}: {e}")
+    if not resolved:
+        raise ValueError("no valid slides in the AI response")
+    return resolved
+
+def validate_slide_config(slide_data, template_structure):
+    """Checks a slide config against the template structure, returning a cleaned copy.
+
+    Raises ValueError when the master/layout does not exist or nothing usable remains.
+    Placeholders the layout does not have (or that are non-content, like footers) are
+    dropped and placeholder types are taken from the template.
+    """
+    if not isinstance(slide_data, dict) or not isinstance(slide_data.get("placeholders"), dict):
+        raise ValueError("slide config must be an object with a 'placeholders' object")
+    try:
+        master_idx = int(slide_data["master_idx"])
+        layout_idx = int(slide_data["layout_idx"])
+        layout = template_structure["masters"][master_idx]["layouts"][layout_idx]
+    except (KeyError, IndexError, TypeError, ValueError):
+        raise ValueError(f"unknown layout {slide_data.get('master_idx')}/{slide_data.get('layout_idx')}")
+
+    layout_types = {
+        str(ph["idx"]): ph["type"] for ph in layout["placeholders"]
+        if ph["type"] not in NON_CONTENT_PLACEHOLDER_TYPES
+    }
+    placeholders = {}
+    for ph_idx, ph_data in slide_data["placeholders"].items():
+        if str(ph_idx) in layout_types and isinstance(ph_data, dict) and isinstance(ph_data.get("content"), str):
+            placeholders[str(ph_idx)] = {"type": layout_types[str(ph_idx)], "content": ph_data["content"]}
+    if not placeholders:
+        raise ValueError(f"no valid placeholders for layout {master_idx}/{layout_idx}")
+    return {"master_idx": master_idx, "layout_idx": layout_idx, "placeholders": placeholders}
+
+def build_slide_config_prompts(outline, index, total, titles, schema):
+    """Builds the system and user prompts for one outline slide's config."""
+    lines = [
+        f"Slide {index + 1} of {total}.",
+        f"All slide titles: {json.dumps(titles, ensure_ascii=False)}",
+        "",
+        f"Slide: {outline.get('title', 'Untitled')}",
+    ]
+    lines.extend(f"- {content_item}" for content_item in outline.get("content", []))
+    return build_slide_config_prompt(schema), "\n".join(lines)
+
+async def generate_slide_config(outline, index, total, titles, schema, use_cache=True):
+    """Generates and validates the config for one outline slide."""
+    system_prompt, user_prompt = build_slide_config_prompts(outline, index, total, titles, schema)
+    cache_key = llm_cache.make_key("slide_config", CONFIG_FANOUT_MODEL, system_prompt, user_prompt)
+    cached = await asyncio.to_thread(cache_lookup, cache_key, use_cache)
+    if cached is not None:
+        return json.loads(cached)
+
+    response = await chat_completion(
+        "slide_config",
+        model=CONFIG_FANOUT_MODEL,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        response_format={"type": "json_object"},
+        timeout=60
+    )
+    log_prompt_usage(f"Slide {index + 1} config", schema, response)
+    slide_data = resolve_slide_config(json.loads(response.choices[0].message.content), schema)
+    await asyncio.to_thread(
+        cache_store, cache_key, "slide_config", json.dumps(slide_data), completion_cost(CONFIG_FANOUT_MODEL, response)
+    )
+    return slide_data
+
+async def iter_slide_configs_fanout(outlines, schema, use_cache=True, reuse=None):
+    """Yields ``(index, config)`` for each outline slide, in order, generated concurrently.
+
+    Each slide is its own small model call, so wall time is roughly that of the slowest
+    slide. Slides with a config in ``reuse`` (a list aligned with ``outlines``) are yielded
+    as is. A slide that fails or does not validate is retried on its own up to
+    CONFIG_FANOUT_RETRIES times and then skipped.
+    """
+    titles = [outline.get("title", "Untitled") for outline in outlines]
+    total = len(outlines)
+    reuse = reuse or [None] * total
+    slots = asyncio.Semaphore(max(1, CONFIG_FANOUT_CONCURRENCY))
+
+    async def generate(index):
+        for attempt in range(CONFIG_FANOUT_RETRIES + 1):
+            try:
+                async with slots:
+                    return await generate_slide_config(outlines[index], index, total, titles, schema, use_cache)
+            except Exception as e:
+                logger.error(f"Error generating config for slide {index + 1} (attempt {attempt + 1}): {e}")
+        return None
+
+    tasks = {index: asyncio.create_task(generate(index)) for index in range(total) if reuse[index] is None}
+    try:
+        for index in range(total):
+            slide_data = await tasks[index] if index in tasks else reuse[index]
+            if slide_data:
+                yield index, slide_data
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+class SlideArrayParser:
+    """Incrementally parses a streamed ``{"slides": [...]}`` JSON document.
+
+    ``feed()`` takes the next chunk of model output and returns the slide objects that
+    were completed by it, so callers can act on each slide before the response ends.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._array_depth = None
+        self._item_start = None
+
+    def feed(self, text):
+        self.buffer += text
+        items = []
+        while self._pos < len(self.buffer):
+            ch = self.buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                # The slides array is the first array opened directly inside the top-level object
+                if ch == "[" and self._array_depth is None and self._depth == 1:
+                    self._array_depth = self._depth + 1
+                elif ch == "{" and self._array_depth is not None and self._depth == self._array_depth:
+                    self._item_start = self._pos
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if ch == "}" and self._item_start is not None and self._depth == self._array_depth:
+                    items.append(json.loads(self.buffer[self._item_start:self._pos + 1]))
+                    self._item_start = None
+            self._pos += 1
+        return items
+
+async def stream_slide_objects(stage, usage=None, **completion_args):
+    """Streams a chat completion and yields each object of its "slides" array as soon as it is complete.
+
+    The whole stream is timed as an ``llm_<stage>`` span. If ``usage`` is a dict, it receives
+    the final chunk's token usage under "response".
+    """
+    open_async_clients()
+    started = time.monotonic()
+    parser = SlideArrayParser()
+    count = 0
+    model = completion_args.get("model")
+    async with llm_slots:
+        with span(f"llm_{stage}", model=model, streamed=True) as attributes:
+            stream = await call_openai(
+                async_openai.chat.completions.create, stream=True, stream_options={"include_usage": True},
+                **completion_args
+            )
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    record_llm_usage(model, chunk, attributes)
+                    if usage is not None:
+                        usage["response"] = chunk
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                for item in parser.feed(chunk.choices[0].delta.content):
+                    if count == 0:
+                        attributes["first_slide_s"] = round(time.monotonic() - started, 3)
+                        logger.info(f"First slide streamed after {time.monotonic() - started:.2f}s")
+                    count += 1
+                    yield item
+            attributes["slides"] = count
+            if count == 0:
+                raise ValueError("The AI response did not contain a valid 'slides' array.")
+
+async def stream_structured_outline(prompt: str, slide_count: int, language: str, use_cache=True):
+    """Streaming variant of generate_structured_outline() that yields each slide outline as it completes."""
+    system_prompt, user_prompt = build_outline_prompts(prompt, slide_count, language)
+    cached, cache_key, vector = await lookup_cached_outline(system_prompt, user_prompt, prompt, slide_count, language, use_cache)
+    if cached is not None:
+        for slide in cached:
+            yield slide
+        return
+
+    if payload_log_sampled():
+        logger.info(f"Streaming outline for topic: {prompt}")
+    usage = {}
+    slides = []
+    async for slide in stream_slide_objects(
+        "outline",
+        usage=usage,
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        response_format={"type": "json_object"}
+    ):
+        slides.append(slide)
+        yield slide
+    await asyncio.to_thread(
+        store_cached_outline, cache_key, vector, slides, completion_cost("gpt-4o-mini", usage.get("response")),
+        system_prompt, slide_count, language
+    )
+
+async def stream_presentation_config(content, schema, use_cache=True):
+    """Streaming variant of generate_presentation_config() that yields each resolved slide config as it completes."""
+    prompt = build_config_prompt(schema)
+    cache_key = llm_cache.make_key("config", "gpt-4", prompt, content)
+    cached = await asyncio.to_thread(cache_lookup, cache_key, use_cache)
+    if cached is not None:
+        for slide_data in json.loads(cached)["slides"]:
+            yield slide_data
+        return
+
+    usage = {}
+    slides = []
+    index = 0
+    async for slide_data in stream_slide_objects(
+        "config",
+        usage=usage,
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": content}
+        ],
+        timeout=60
+    ):
+        index += 1
+        try:
+            slides.append(resolve_slide_config(slide_data, schema))
+        except ValueError as e:
+            logger.error(f"Skipping invalid config for slide {index}: {e}")
+            continue
+        yield slides[-1]
+    if slides:
+        await asyncio.to_thread(
+            cache_store, cache_key, "config", json.dumps({"slides": slides}),
+            completion_cost("gpt-4", usage.get("response"))
+        )
+
+def spool_file():
+    """Returns a temporary file that stays in memory up to SPOOL_MAX_MEMORY_BYTES, then moves to disk."""
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY_BYTES)
+
+def iter_file(fileobj):
+    """Yields a file's contents in FILE_CHUNK_SIZE chunks and closes it afterwards."""
+    try:
+        fileobj.seek(0)
+        while chunk := fileobj.read(FILE_CHUNK_SIZE):
+            yield chunk
+    finally:
+        fileobj.close()
+
+def write_result_file(fileobj):
+    """Copies a result into its own temp file and returns the path; the caller deletes it."""
+    fd, path = tempfile.mkstemp(prefix="slidex-result-")
+    try:
+        with os.fdopen(fd, "wb") as out, fileobj:
+            fileobj.seek(0)
+            shutil.copyfileobj(fileobj, out, FILE_CHUNK_SIZE)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+def claim_result_file(path):
+    """Moves a file out of a scratch directory into its own result file and returns the new path."""
+    fd, result_path = tempfile.mkstemp(prefix="slidex-result-")
+    os.close(fd)
+    os.replace(path, result_path)
+    return result_path
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class SharedImageFetches:
+    """Deduplicates image fetches across several decks built together (e.g. one batch).
+
+    The first deck that needs a query starts the fetch as a task; every other deck awaits the same task.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    def get(self, query):
+        task = self._tasks.get(query)
+        if task is None:
+            task = self._tasks[query] = asyncio.ensure_future(fetch_image(query))
+        # A cancelled deck must not cancel a download other decks are waiting for
+        return asyncio.shield(task)
+
+    def close(self):
+        for task in self._tasks.values():
+            task.cancel()
+
+
+class DeckBuilder:
+    """Builds a deck from a pooled template one slide config at a time.
+
+    Text is filled in as each slide is added, so a streamed deck is assembled while later
+    configs are still arriving. Pictures come from ``images`` (query -> bytes or None),
+    which only has to be complete by the time ``finish()`` inserts them.
+    """
+
+    TEXT_PLACEHOLDER_TYPES = ["Title", "Body", "Center Title", "Subtitle", "Date", "Footer", "Header", "Slide Number"]
+
+    def __init__(self, template_path, images):
+        self.prs = template_pool.open(template_path)
+        self._images = images
+        self._pictures = []
+
+    def add_slide(self, slide_data):
+        master_idx = slide_data["master_idx"]
+        layout_idx = slide_data["layout_idx"]
+        placeholders_data = slide_data["placeholders"]
+
+        with span("slide_assembly"):
+            master = self.prs.slide_masters[master_idx]
+            layout = master.slide_layouts[layout_idx]
+            slide = self.prs.slides.add_slide(layout)
+
+            for ph_idx_str, ph_data in placeholders_data.items():
+                ph_idx = int(ph_idx_str)
+                placeholder = next((shape for shape in slide.placeholders if shape.placeholder_format.idx == ph_idx), None)
+                if placeholder:
+                    placeholder_type = ph_data["type"]
+                    content = ph_data["content"]
+                    if placeholder_type in self.TEXT_PLACEHOLDER_TYPES:
+                        placeholder.text = content
+                    elif placeholder_type == "Picture" and content:
+                        self._pictures.append((placeholder, content))
+        return slide
+
+    def finish(self):
+        """Inserts the pictures and returns the saved deck as a spooled file at offset 0."""
+        for placeholder, query in self._pictures:
+            image_bytes = self._images.get(query)
+            if image_bytes:
+                try:
+                    with span("picture_insert"):
+                        if IMAGE_NORMALIZE and placeholder.width and placeholder.height:
+                            image_bytes = normalize_image(image_bytes, placeholder.width, placeholder.height)
+                        placeholder.insert_picture(io.BytesIO(image_bytes))
+                except Exception as e:
+                    logger.error(f"Error inserting image: {e}")
+
+        pptx_file = spool_file()
+        with span("pptx_save") as attributes:
+            self.prs.save(pptx_file)
+            attributes["bytes"] = pptx_file.tell()
+        pptx_file.seek(0)
+        return pptx_file
+
+async def fetch_images(queries, image_fetches=None):
+    """Downloads the images for all queries concurrently and returns query -> bytes (None on failure).
+
+    At most IMAGE_FETCH_CONCURRENCY of them are in flight for one deck. ``image_fetches``
+    (a SharedImageFetches) shares the downloads with other decks.
+    """
+    unique_queries = list(dict.fromkeys(queries))
+    slots = asyncio.Semaphore(max(1, IMAGE_FETCH_CONCURRENCY))
+
+    async def fetch(query):
+        async with slots:
+            return await (image_fetches.get(query) if image_fetches is not None else fetch_image(query))
+
+    results = await asyncio.gather(*(fetch(query) for query in unique_queries))
+    return dict(zip(unique_queries, results))
+
+def build_pptx(template_path, slides, images):
+    """Builds a deck from resolved slide configs and already-downloaded images (query -> bytes or None)."""
+    builder = DeckBuilder(template_path, images)
+    for slide_data in slides:
+        builder.add_slide(slide_data)
+    return builder.finish()
+
+def _init_build_worker():
+    """Process-pool initializer: preloads every template so the first build in each worker is warm."""
+    for template_path in TEMPLATE_PATHS.values():
+        if os.path.exists(template_path):
+            template_pool.get_bytes(template_path)
+
+def _ping_build_worker():
+    return os.getpid()
+
+def _build_in_worker(template_path, slides, image_index, images_shm_name):
+    """Builds a deck inside a pool worker.
+
+    Image bytes are read from the caller's shared-memory block (``image_index`` maps each
+    query to its offset and length) and the saved deck is written to a new block, so
+    neither side pickles the payloads. Returns (block name, deck size).
+    """
+    images = {}
+    if images_shm_name:
+        images_shm = shared_memory.SharedMemory(name=images_shm_name)
+        try:
+            for query, (offset, size) in image_index.items():
+                images[query] = bytes(images_shm.buf[offset:offset + size]) if size else None
+        finally:
+            images_shm.close()
+
+    with build_pptx(template_path, slides, images) as pptx_file:
+        size = pptx_file.seek(0, io.SEEK_END)
+        pptx_file.seek(0)
+        output_shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+        try:
+            offset = 0
+            while read := pptx_file.readinto(output_shm.buf[offset:size]):
+                offset += read
+        finally:
+            output_shm.close()
+    return output_shm.name, size
+
+
+class PptxBuildPool:
+    """Pre-warmed process pool for the CPU-bound deck build (lxml edits, picture parsing, zip on save).
+
+    Building in separate processes keeps concurrent requests from serializing on the GIL.
+    Workers start with every template preloaded; payloads travel through shared memory.
+    """
+
+    def __init__(self, processes):
+        self.processes = processes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_build_worker,
+                )
+            executor = self._executor
+        # Spawn every worker now rather than on the first requests
+        for future in [executor.submit(_ping_build_worker) for _ in range(self.processes)]:
+            future.result()
+        return executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def build(self, template_path, slides, images):
+        """Builds the deck on a worker process and returns it as a spooled file.
+
+        The build is awaited on the event loop, so no thread waits while the worker process runs.
+        """
+        with self._lock:
+            executor = self._executor
+        if executor is None:
+            executor = await asyncio.to_thread(self.start)
+
+        images_shm, image_index = await asyncio.to_thread(self._share_images, images)
+        try:
+            future = executor.submit(
+                _build_in_worker, template_path, slides, image_index, images_shm.name if images_shm else None
+            )
+            try:
+                shm_name, size = await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                # The worker may still finish; its output would otherwise stay in shared memory
+                future.add_done_callback(_discard_build_output)
+                raise
+        except BrokenProcessPool:
+            logger.error("PPTX build worker died; restarting the process pool")
+            self.shutdown()
+            raise
+        finally:
+            if images_shm is not None:
+                images_shm.close()
+                images_shm.unlink()
+        return await asyncio.to_thread(_read_build_output, shm_name, size)
+
+    @staticmethod
+    def _share_images(images):
+        """Copies the images into one shared memory block, returning it and each query's (offset, size)."""
+        image_index = {}
+        images_shm = None
+        total = sum(len(data) for data in images.values() if data)
+        if total:
+            images_shm = shared_memory.SharedMemory(create=True, size=total)
+            offset = 0
+            for query, data in images.items():
+                size = len(data) if data else 0
+                images_shm.buf[offset:offset + size] = data or b""
+                image_index[query] = (offset, size)
+                offset += size
+        else:
+            image_index = {query: (0, 0) for query in images}
+        return images_shm, image_index
+
+
+def _read_build_output(shm_name, size):
+    """Copies a deck built by a worker process out of shared memory into a spooled file."""
+    output_shm = shared_memory.SharedMemory(name=shm_name)
+    pptx_file = spool_file()
+    try:
+        for offset in range(0, size, FILE_CHUNK_SIZE):
+            pptx_file.write(output_shm.buf[offset:min(offset + FILE_CHUNK_SIZE, size)])
+    finally:
+        output_shm.close()
+        output_shm.unlink()
+    pptx_file.seek(0)
+    return pptx_file
+
+def _discard_build_output(future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    output_shm = shared_memory.SharedMemory(name=future.result()[0])
+    output_shm.close()
+    output_shm.unlink()
+
+
+pptx_build_pool = PptxBuildPool(PPTX_BUILD_PROCESSES)
+
+async def run_pptx_build(template_path, slides, images):
+    """Runs the CPU-bound deck build off the event loop, on a thread or the process pool."""
+    if PPTX_BUILD_BACKEND == "process":
+        # Spans inside the worker process are not visible here, so the whole build is one span
+        with span("pptx_build_process"):
+            return await pptx_build_pool.build(template_path, slides, images)
+    return await asyncio.to_thread(build_pptx, template_path, slides, images)
+
+async def generate_pptx_from_config(template_path, json_config, progress=None, image_fetches=None):
+    """Generates a PowerPoint file from the template and JSON configuration, including image insertion.
+
+    ``progress``, if given, is called with the name of each stage ("images", "pptx") as it starts.
+    ``image_fetches`` (a SharedImageFetches) shares image downloads with other decks.
+    """
+    config = json.loads(json_config)
+    # Resolve and download every picture up front, concurrently, before filling the slides
+    if progress:
+        progress("images")
+    images = await fetch_images(collect_picture_queries(config), image_fetches)
+    if progress:
+        progress("pptx")
+    return await run_pptx_build(template_path, config["slides"], images)
+
+def get_libreoffice_path():
+    """Determines the path to the LibreOffice executable."""
+    if os.environ.get("LIBREOFFICE_PATH"):
+        return os.environ["LIBREOFFICE_PATH"]
+    if platform.system() == "Darwin":  # macOS
+        return "/opt/homebrew/bin/libreoffice"
+    elif platform.system() == "Linux":  # Ubuntu/Debian
+        return "/usr/bin/libreoffice"
+    else:  # Fallback for other systems
+        return "libreoffice"
+
+def get_libreoffice_python():
+    """Determines the Python with the UNO bridge that runs libreoffice_worker.py; empty disables warm workers."""
+    if "LIBREOFFICE_PYTHON" in os.environ:
+        return os.environ["LIBREOFFICE_PYTHON"]
+    if platform.system() == "Darwin":  # macOS: LibreOffice bundles its own Python
+        return "/Applications/LibreOffice.app/Contents/Resources/python"
+    return "/usr/bin/python3"  # Debian/Ubuntu: system Python with python3-uno
+
+# Helper that drives a long-lived soffice over UNO, run under get_libreoffice_python()
+UNO_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "libreoffice_worker.py")
+
+@lru_cache(maxsize=1)
+def check_uno_available():
+    """Check if the UNO helper's Python can import the bridge. The result is cached for the life of the process."""
+    libreoffice_python = get_libreoffice_python()
+    if not libreoffice_python or not os.path.exists(UNO_WORKER_SCRIPT):
+        return False
+    try:
+        result = subprocess.run([libreoffice_python, "-c", "import uno"], capture_output=True, timeout=10)
+        return result.returncode == 0
+    except (subprocess.TimeoutExpired, OSError):
+        return False
+
+@lru_cache(maxsize=1)
+def check_libreoffice_installed():
+    """Check if LibreOffice is installed and accessible. The result is cached for the life of the process."""
+    libreoffice_path = get_libreoffice_path()
+    try:
+        if not os.path.exists(libreoffice_path) and libreoffice_path != "libreoffice":
+             return False
+        result = subprocess.run([libreoffice_path, "--version"], 
+                              capture_output=True, text=True, timeout=10)
         return result.returncode == 0
     except (subprocess.TimeoutExpired, FileNotFoundError):
         return False
 
-def convert_pptx_to_pdf(pptx_stream):
-    """Converts a PowerPoint file to PDF using LibreOffice headless mode."""
+class LibreOfficeWorker:
+    """A headless soffice worker with its own user profile.
+
+    When a Python with the UNO bridge is available (see get_libreoffice_python()), the worker
+    keeps one soffice process running, listening on a named pipe, and converts documents
+    through a libreoffice_worker.py helper that talks to it over UNO. Otherwise each
+    conversion runs a one-shot ``--convert-to`` process against the worker's private
+    profile, which still keeps concurrent conversions from colliding on the shared default
+    profile. Pipe and profile names include the process ID, so the workers of several API
+    processes on one host never share them.
+    """
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.name = f"slidex-{os.getpid()}-{worker_id}"
+        self.profile_dir = os.path.join(LIBREOFFICE_PROFILE_DIR, self.name)
+        self.process = None
+        self.helper = None
+        self.jobs = 0
+
+    @property
+    def profile_url(self):
+        return "file://" + os.path.abspath(self.profile_dir)
+
+    def start(self):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.jobs = 0
+        if not check_uno_available():
+            return
+        self.process = subprocess.Popen([
+            get_libreoffice_path(), "--headless", "--invisible", "--nologo", "--nodefault",
+            "--norestore", "--nolockcheck", f"-env:UserInstallation={self.profile_url}",
+            f"--accept=pipe,name={self.name};urp;StarOffice.ComponentContext",
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.helper = subprocess.Popen(
+            [get_libreoffice_python(), UNO_WORKER_SCRIPT, self.name, str(LIBREOFFICE_CONVERT_TIMEOUT)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        try:
+            # The helper's first reply says whether it reached soffice
+            self._reply(LIBREOFFICE_CONVERT_TIMEOUT + 5)
+        except Exception as e:
+            self.stop()
+            raise Exception(f"LibreOffice worker {self.worker_id} failed to start: {e}")
+        logger.info(f"LibreOffice worker {self.worker_id} listening on pipe {self.name}")
+
+    def _request(self, timeout, **message):
+        """Sends one request to the helper and waits at most ``timeout`` seconds for its reply."""
+        self.helper.stdin.write(json.dumps(message) + "\n")
+        self.helper.stdin.flush()
+        self._reply(timeout)
+
+    def _reply(self, timeout):
+        # UNO calls cannot be interrupted, so a worker that does not answer in time is killed
+        ready, _, _ = select.select([self.helper.stdout], [], [], timeout)
+        if not ready:
+            self.kill()
+            raise subprocess.TimeoutExpired("soffice", timeout)
+        line = self.helper.stdout.readline()
+        if not line:
+            raise Exception("LibreOffice helper exited")
+        reply = json.loads(line)
+        if not reply["ok"]:
+            raise Exception(reply["error"])
+
+    def kill(self):
+        for process in (self.helper, self.process):
+            if process is not None and process.poll() is None:
+                process.kill()
+
+    def stop(self):
+        if self.helper is not None:
+            # Closing its stdin makes the helper terminate soffice and exit
+            try:
+                self.helper.stdin.close()
+                self.helper.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.helper.kill()
+                self.helper.wait()
+            self.helper.stdout.close()
+            self.helper = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def is_healthy(self):
+        if not check_uno_available():
+            # One-shot conversions keep no process between jobs, so there is nothing to check
+            return True
+        if self.helper is None or self.helper.poll() is not None or self.process.poll() is not None:
+            return False
+        try:
+            self._request(5, op="ping")
+            return True
+        except Exception:
+            return False
+
+    def convert(self, pptx_path, out_dir):
+        """Converts ``pptx_path`` to a PDF with the same base name in ``out_dir``."""
+        pdf_path = os.path.join(out_dir, os.path.splitext(os.path.basename(pptx_path))[0] + ".pdf")
+        if not check_uno_available():
+            result = subprocess.run([
+                get_libreoffice_path(), "--headless", f"-env:UserInstallation={self.profile_url}",
+                "--convert-to", "pdf", "--outdir", out_dir, pptx_path
+            ], capture_output=True, text=True, timeout=LIBREOFFICE_CONVERT_TIMEOUT)
+            if result.returncode != 0:
+                raise Exception(f"PDF conversion failed: {result.stderr}")
+        else:
+            self._request(
+                LIBREOFFICE_CONVERT_TIMEOUT, op="convert",
+                src=os.path.abspath(pptx_path), dst=os.path.abspath(pdf_path)
+            )
+        self.jobs += 1
+        return pdf_path
+
+
+class LibreOfficePool:
+    """Pool of warm LibreOffice workers fed from a bounded wait queue.
+
+    Callers wait for a free worker on the event loop, and conversions run on the pool's own
+    threads (one per worker), so a burst of conversions never ties up the default executor
+    that cache lookups and deck builds share. Workers are health-checked before each job,
+    restarted after a failure, and recycled after LIBREOFFICE_MAX_JOBS_PER_WORKER
+    conversions to keep soffice memory in check.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="libreoffice")
+        self._slots = None
+        self._loop = None
+        self.waiting = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+
+    def start(self):
+        # Held until every worker is queued, so no caller finds the pool started but empty
+        with self._start_lock:
+            if self._started:
+                return
+            for worker_id in range(self.size):
+                worker = LibreOfficeWorker(worker_id)
+                try:
+                    worker.start()
+                except Exception as e:
+                    logger.error(f"Error starting LibreOffice worker {worker_id}: {e}")
+                self._idle.put(worker)
+            self._started = True
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.stop()
+            # Profiles are per process, so nothing would ever reuse them
+            shutil.rmtree(worker.profile_dir, ignore_errors=True)
+
+    async def convert(self, pptx_path, out_dir):
+        """Runs one conversion on the next free worker and returns the PDF path.
+
+        At most LIBREOFFICE_MAX_WAITING callers wait for a worker; the rest are turned away at once.
+        """
+        if not self._started:
+            await asyncio.to_thread(self.start)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Counts idle workers; whoever holds a slot can take a worker off the idle queue at once
+            self._slots = asyncio.Semaphore(self.size)
+            self._loop = loop
+        with self._lock:
+            if self.waiting >= LIBREOFFICE_MAX_WAITING:
+                self.rejected += 1
+                raise Overloaded("PDF conversion queue is full, please retry later")
+            self.waiting += 1
+        try:
+            with span("libreoffice_wait"):
+                await asyncio.wait_for(self._slots.acquire(), LIBREOFFICE_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise Overloaded("Timed out waiting for a PDF conversion worker, please retry later")
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+        worker = self._idle.get_nowait()
+        conversion = loop.run_in_executor(
+            self._executor, copy_context().run, self._convert_on, worker, pptx_path, out_dir
+        )
+        # A cancelled caller leaves the worker busy until its conversion ends, so the slot is freed only then
+        conversion.add_done_callback(self._release_slot)
+        return await asyncio.shield(conversion)
+
+    def _release_slot(self, conversion):
+        self._slots.release()
+        if not conversion.cancelled():
+            conversion.exception()  # retrieved here in case the caller was cancelled
+
+    def _convert_on(self, worker, pptx_path, out_dir):
+        try:
+            if not worker.is_healthy():
+                self._restart(worker)
+            with span("libreoffice_convert", worker=worker.worker_id):
+                pdf_path = worker.convert(pptx_path, out_dir)
+            with self._lock:
+                self.completed += 1
+            if worker.jobs >= LIBREOFFICE_MAX_JOBS_PER_WORKER:
+                self._restart(worker)
+            return pdf_path
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            self._restart(worker)
+            raise
+        finally:
+            self._idle.put(worker)
+
+    def _restart(self, worker):
+        with self._lock:
+            self.restarts += 1
+        try:
+            worker.restart()
+        except Exception as e:
+            logger.error(f"Error restarting LibreOffice worker {worker.worker_id}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.size,
+                "idle": self._idle.qsize(),
+                "waiting": self.waiting,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+                "restarts": self.restarts,
+                "uno": check_uno_available(),
+            }
+
+
+libreoffice_pool = LibreOfficePool(LIBREOFFICE_WORKERS)
+
+async def convert_pptx_to_pdf(pptx_path, work_dir):
+    """Converts a PowerPoint file to PDF on the warm LibreOffice worker pool.
+
+    The PDF is written into ``work_dir`` and its path returned; nothing is read into memory.
+    """
     
     # Check if LibreOffice is installed
     if not check_libreoffice_installed():
@@ -339,37 +2452,18 @@ def convert_pptx_to_pdf(pptx_stream):
         )
     
     try:
-        # Create temporary directory
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Save PPTX to temporary file
-            pptx_path = os.path.join(temp_dir, "presentation.pptx")
-            with open(pptx_path, "wb") as f:
-                f.write(pptx_stream.getvalue())
-            
-            # Convert to PDF using LibreOffice
-            logger.info("Converting PPTX to PDF using LibreOffice...")
-            libreoffice_path = get_libreoffice_path()
-
-            result = subprocess.run([
-                libreoffice_path, "--headless", "--convert-to", "pdf", 
-                "--outdir", temp_dir, pptx_path
-            ], capture_output=True, text=True, timeout=60)
-            
-            if result.returncode != 0:
-                logger.error(f"LibreOffice conversion failed: {result.stderr}")
-                raise Exception(f"PDF conversion failed: {result.stderr}")
-            
-            # Read the generated PDF
-            pdf_path = os.path.join(temp_dir, "presentation.pdf")
-            if not os.path.exists(pdf_path):
-                raise Exception("PDF file was not generated")
-            
-            with open(pdf_path, "rb") as pdf_file:
-                pdf_content = pdf_file.read()
-            
-            logger.info("Successfully converted PPTX to PDF")
-            return io.BytesIO(pdf_content)
+        # Convert to PDF on a pooled LibreOffice worker
+        logger.info("Converting PPTX to PDF using LibreOffice...")
+        pdf_path = await libreoffice_pool.convert(pptx_path, work_dir)
+        
+        if not os.path.exists(pdf_path):
+            raise Exception("PDF file was not generated")
+        
+        logger.info("Successfully converted PPTX to PDF")
+        return pdf_path
             
+    except HTTPException:
+        raise
     except subprocess.TimeoutExpired:
         logger.error("LibreOffice conversion timed out")
         raise Exception("PDF conversion timed out")
@@ -383,38 +2477,988 @@ def convert_pptx_to_pdf(pptx_stream):
         logger.error(f"Error converting PPTX to PDF: {e}")
         raise Exception(f"PDF conversion failed: {str(e)}")
 
+def resolve_template_path(template_id):
+    """Maps a template ID to its file, raising a 400 if the template is unknown or missing."""
+    template_path = TEMPLATE_PATHS.get(template_id)
+    if not template_path:
+        raise HTTPException(status_code=400, detail=f"Template '{template_id}' not found")
+    if not os.path.exists(template_path):
+        raise HTTPException(status_code=400, detail=f"Template file '{template_path}' not found")
+    return template_path
+
+def outlines_to_content(outlines):
+    """Flattens slide outlines into the plain-text content string sent to the config model."""
+    content_parts = []
+    for outline in outlines:
+        content_parts.append(f"Slide: {outline.get('title', 'Untitled')}")
+        for content_item in outline.get('content', []):
+            content_parts.append(f"- {content_item}")
+        content_parts.append("")  # Empty line between slides
+    return "\n".join(content_parts)
+
+async def build_deck_from_content(content, progress=None, use_cache=True):
+    """Runs the /generate_slide pipeline (outline -> config -> images -> pptx) on the default template."""
+    if progress:
+        progress("outline")
+    schema = await asyncio.to_thread(template_catalog.get_schema, DEFAULT_TEMPLATE_PATH)
+    outline = await generate_content_outline(content, use_cache)
+    if not outline:
+        raise HTTPException(status_code=400, detail="Failed to generate content outline")
+    if progress:
+        progress("config")
+    config = await generate_presentation_config(outline, schema, use_cache)
+    if not config:
+        raise HTTPException(status_code=400, detail="Failed to generate presentation config")
+    return await generate_pptx_from_config(DEFAULT_TEMPLATE_PATH, config, progress)
+
+async def build_deck_from_outlines(request, session=None, progress=None, image_fetches=None):
+    """Runs the /generate_slide_with_template pipeline (config -> images -> pptx) for prepared outlines.
+
+    With a deck ``session``, only the slides edited since its last deck are regenerated.
+    """
+    logger.info(f"🔍 Received request for template: {request.templateId}")
+    logger.info(f"📝 Total slides received: {len(request.outlines)}")
+    log_payloads = payload_log_sampled()
+    if log_payloads:
+        for i, outline in enumerate(request.outlines):
+            logger.info(f"📄 Slide {i + 1}: '{outline.get('title', 'Untitled')}' - {len(outline.get('content', []))} points")
+            logger.info(f"   Content: {outline.get('content', [])}")
+
+    template_path = session.template_path if session else resolve_template_path(request.templateId)
+
+    # Get the template's compact prompt schema (precomputed in the in-memory catalog)
+    schema = await asyncio.to_thread(template_catalog.get_schema, template_path)
+
+    if log_payloads:
+        logger.info(f"📋 Generated content string:\n{outlines_to_content(request.outlines)}")
+
+    # Generate presentation config using AI
+    if progress:
+        progress("config")
+    try:
+        slides = [slide_data async for slide_data in iter_session_slide_configs(request, session, schema)]
+    except Exception as e:
+        logger.error(f"Error generating configuration: {str(e)}")
+        slides = None
+    if not slides:
+        raise HTTPException(status_code=400, detail="Failed to generate presentation config")
+
+    return await generate_pptx_from_config(template_path, json.dumps({"slides": slides}), progress, image_fetches)
+
+async def stream_deck_from_outlines(request, session, job):
+    """Yields NDJSON events for each slide config as the model streams it, building the deck as slides arrive.
+
+    Picture downloads start as soon as their slide arrives, and slides unchanged since
+    ``session``'s last deck are emitted straight from the session. With the thread build
+    backend each slide is placed in the deck as it arrives and only pictures and the save
+    are left for the end; the process backend builds the whole deck once the configs are
+    in. The finished deck is stored as the result of ``job``; the final event points at it.
+    If the client goes away first, the job is finished as cancelled.
+    """
+    image_tasks = {}
+    images = {}
+    template_path = session.template_path
+    try:
+        schema = await asyncio.to_thread(template_catalog.get_schema, template_path)
+        builder = None
+        if PPTX_BUILD_BACKEND != "process":
+            builder = await asyncio.to_thread(DeckBuilder, template_path, images)
+        job.set_stage("config")
+        slides = []
+        async for slide_data in iter_session_slide_configs(request, session, schema):
+            for query in collect_picture_queries({"slides": [slide_data]}):
+                if query not in image_tasks:
+                    image_tasks[query] = asyncio.create_task(fetch_image(query))
+            yield json.dumps({"event": "slide", "index": len(slides), "slide": slide_data}) + "\n"
+            slides.append(slide_data)
+            if builder is not None:
+                await asyncio.to_thread(builder.add_slide, slide_data)
+        job.set_stage("images")
+        images.update(zip(image_tasks, await asyncio.gather(*image_tasks.values())))
+        job.set_stage("pptx")
+        if builder is not None:
+            pptx_io = await asyncio.to_thread(builder.finish)
+        else:
+            pptx_io = await run_pptx_build(template_path, slides, images)
+        result_path = await asyncio.to_thread(write_result_file, pptx_io)
+        job.finish(result_path=result_path, media_type=PPTX_MEDIA_TYPE, filename=f"{request.title}.pptx")
+        yield json.dumps({
+            "event": "done", "job_id": job.id, "result_url": f"/jobs/{job.id}/result", "session_id": session.id
+        }) + "\n"
+    except Exception as e:
+        logger.error(f"Error in streamed generate_slide_with_template: {e}")
+        job.finish(error=str(e))
+        yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+    finally:
+        for task in image_tasks.values():
+            task.cancel()
+        # A disconnect closes the generator with GeneratorExit/CancelledError, which skip the handler above
+        if not job.done:
+            job.finish(error="cancelled")
+
+async def download_to_file(url, path, max_bytes=MAX_DOWNLOAD_BYTES):
+    """Streams ``url`` to ``path`` in chunks, raising a 413 once it exceeds ``max_bytes``."""
+    open_async_clients()
+    async with async_http.stream("GET", url) as response:
+        if response.status_code != 200:
+            raise HTTPException(status_code=400, detail="Failed to fetch PPTX file")
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"PPTX file exceeds {max_bytes} bytes")
+        received = 0
+        with open(path, "wb") as f:
+            async for chunk in response.aiter_bytes(FILE_CHUNK_SIZE):
+                received += len(chunk)
+                if received > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"PPTX file exceeds {max_bytes} bytes")
+                f.write(chunk)
+
+async def fetch_and_convert_to_pdf(file_url, work_dir, progress=None):
+    """Downloads a PPTX file into ``work_dir`` and converts it to PDF, returning the PDF path."""
+    if progress:
+        progress("download")
+    pptx_path = os.path.join(work_dir, "presentation.pptx")
+    await download_to_file(file_url, pptx_path)
+
+    if progress:
+        progress("pdf")
+    return await convert_pptx_to_pdf(pptx_path, work_dir)
+
+@lru_cache(maxsize=1)
+def check_pdftoppm_installed():
+    """Check if poppler's pdftoppm is available for preview rendering. Cached for the life of the process."""
+    return shutil.which(PDFTOPPM_PATH) is not None
+
+def slide_render_hashes(prs, indices):
+    """Hashes everything that affects how each slide at ``indices`` renders.
+
+    A slide's hash covers its XML, the parts it relates to (layout, master, theme, images,
+    charts, ...) and the slide size, so it changes exactly when the rendered slide can.
+    Notes and links to other slides are ignored.
+    """
+    part_hashes = {}
+    skipped = (RT.SLIDE, RT.NOTES_SLIDE)
+
+    def part_hash(part, visiting):
+        key = id(part)
+        if key in part_hashes:
+            return part_hashes[key]
+        if key in visiting:
+            return str(part.partname)
+        visiting.add(key)
+        digest = hashlib.sha256(part.blob)
+        for rId, rel in sorted(part.rels.items()):
+            if rel.is_external:
+                digest.update(f"{rId}:{rel.target_ref}".encode("utf-8"))
+            elif rel.reltype not in skipped and (rel.reltype != RT.SLIDE_LAYOUT or part is root):
+                # Masters link back to all of their layouts; only the slide's own layout matters
+                digest.update(f"{rId}:{part_hash(rel.target_part, visiting)}".encode("utf-8"))
+        visiting.discard(key)
+        part_hashes[key] = digest.hexdigest()
+        return part_hashes[key]
+
+    size = f"{prs.slide_width}x{prs.slide_height}"
+    hashes = []
+    for index in indices:
+        root = prs.slides[index].part
+        hashes.append(hashlib.sha256(f"{size}:{part_hash(root, set())}".encode("utf-8")).hexdigest())
+    return hashes
+
+def thumbnail_cache_key(slide_hash, width, image_format):
+    return f"thumbnail:{slide_hash}:{width}.{image_format}"
+
+def plan_previews(pptx_path, first, last):
+    """Returns ``(index, slide_hash)`` for each slide in the 1-based inclusive range, raising a 400 if it is invalid."""
+    with span("preview_plan"):
+        prs = Presentation(pptx_path)
+        count = len(prs.slides)
+        last = min(last or count, count)
+        if first < 1 or first > last:
+            raise HTTPException(status_code=400, detail=f"Slide range {first}-{last} is outside the deck's {count} slides")
+        if last - first + 1 > PREVIEW_MAX_SLIDES:
+            raise HTTPException(status_code=400, detail=f"Preview range exceeds {PREVIEW_MAX_SLIDES} slides")
+        indices = list(range(first - 1, last))
+        return list(zip(indices, slide_render_hashes(prs, indices)))
+
+def write_slide_subset(pptx_path, indices, work_dir, name):
+    """Saves a copy of the deck with only the slides at ``indices`` (in order), returning its path."""
+    prs = Presentation(pptx_path)
+    keep = set(indices)
+    sld_id_lst = prs.slides._sldIdLst
+    for index, sld_id in reversed(list(enumerate(sld_id_lst))):
+        if index in keep:
+            continue
+        rId = sld_id.rId
+        sld_id_lst.remove(sld_id)
+        prs.part.drop_rel(rId)
+    # LibreOffice leaves hidden slides out of the PDF, which would shift the page numbers
+    for slide in prs.slides:
+        slide._element.attrib.pop("show", None)
+    subset_path = os.path.join(work_dir, f"{name}.pptx")
+    prs.save(subset_path)
+    return subset_path
+
+def rasterize_pdf_page(pdf_path, page, width, image_format):
+    """Renders one PDF page at ``width`` pixels with pdftoppm and returns it encoded as PNG or WebP."""
+    out_prefix = f"{os.path.splitext(pdf_path)[0]}-page{page}"
+    with span("preview_rasterize", width=width, format=image_format):
+        result = subprocess.run([
+            PDFTOPPM_PATH, "-png", "-singlefile", "-f", str(page), "-l", str(page),
+            "-scale-to-x", str(width), "-scale-to-y", "-1", pdf_path, out_prefix
+        ], capture_output=True, text=True, timeout=LIBREOFFICE_CONVERT_TIMEOUT)
+        if result.returncode != 0:
+            raise Exception(f"Preview rendering failed: {result.stderr}")
+        png_path = out_prefix + ".png"
+        output = io.BytesIO()
+        try:
+            with Image.open(png_path) as img:
+                if image_format == "png":
+                    img.save(output, "PNG", optimize=True)
+                else:
+                    img.save(output, "WEBP", quality=PREVIEW_WEBP_QUALITY, method=4)
+        finally:
+            remove_file(png_path)
+    return output.getvalue()
+
+def outline_hash(outline):
+    """Stable hash of one outline slide, used to recognise unchanged slides across resubmits."""
+    return hashlib.sha256(json.dumps(outline, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class DeckSession:
+    """The slide configs of the last deck generated in a session, keyed by outline slide hash."""
+
+    def __init__(self, template_path):
+        self.id = uuid.uuid4().hex
+        self.template_path = template_path
+        self.slide_configs = {}
+        self.updated_at = time.time()
+
+
+class DeckSessionStore:
+    """Keeps recent deck sessions in memory, evicting the least recently used beyond ``max_sessions``.
+
+    Configs are matched by outline hash rather than position, so reordering or inserting
+    slides still reuses the configs of the slides that did not change. Images of reused
+    slides come back from the image cache, which is keyed by the same Pexels queries.
+    """
+
+    def __init__(self, ttl, max_sessions):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused_slides = 0
+        self.regenerated_slides = 0
+
+    def open(self, session_id, template_path):
+        """Returns session ``session_id``, or a new session when it is unknown, expired or for another template."""
+        with self._lock:
+            self._purge_expired()
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None or session.template_path != template_path:
+                session = DeckSession(template_path)
+                self._sessions[session.id] = session
+                self.created += 1
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session.id)
+            return session
+
+    def reusable_configs(self, session, outlines):
+        """Returns each outline slide's hash and the session's config for it (None for new or edited slides)."""
+        hashes = [outline_hash(outline) for outline in outlines]
+        with self._lock:
+            return hashes, [session.slide_configs.get(slide_hash) for slide_hash in hashes]
+
+    def record(self, session, hashes, configs, reused):
+        """Replaces the session's slides with this deck's configs; slides without a config are dropped."""
+        with self._lock:
+            session.slide_configs = {
+                slide_hash: config for slide_hash, config in zip(hashes, configs) if config is not None
+            }
+            session.updated_at = time.time()
+            self.reused_slides += reused
+            self.regenerated_slides += len(hashes) - reused
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl
+        expired = [session_id for session_id, session in self._sessions.items() if session.updated_at < cutoff]
+        for session_id in expired:
+            del self._sessions[session_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "created": self.created,
+                "reused_slides": self.reused_slides,
+                "regenerated_slides": self.regenerated_slides,
+            }
+
+
+deck_sessions = DeckSessionStore(DECK_SESSION_TTL, DECK_SESSION_MAX)
+
+
+async def iter_session_slide_configs(request, session, schema):
+    """Yields the deck's slide configs in order, regenerating only the slides edited since the session's last deck.
+
+    Once every slide has been yielded, the configs are recorded in the session for the next
+    resubmit; without a ``session`` every slide is generated. A deck with nothing to reuse
+    follows the request's config mode; otherwise the changed slides go through the per-slide
+    fan-out path. Only fan-out configs are recorded: a whole-deck answer may merge and split
+    slides, so even a matching slide count does not tie its configs to outline slides.
+    """
+    total = len(request.outlines)
+    hashes, reuse = deck_sessions.reusable_configs(session, request.outlines) if session else (None, [None] * total)
+    if request.regenerate:
+        reuse = [None] * total
+    reused = sum(config is not None for config in reuse)
+    if reused:
+        logger.info(f"♻️ Session {session.id}: reusing {reused}/{total} slide configs")
+
+    configs = [None] * total
+    if reused or (request.configMode or CONFIG_MODE) == "fanout":
+        async for index, slide_data in iter_slide_configs_fanout(request.outlines, schema, not request.regenerate, reuse):
+            configs[index] = slide_data
+            yield slide_data
+    else:
+        async for slide_data in stream_presentation_config(
+            outlines_to_content(request.outlines), schema, not request.regenerate
+        ):
+            yield slide_data
+    if session:
+        deck_sessions.record(session, hashes, configs, reused)
+
+async def stream_previews(request, work_dir):
+    """Yields NDJSON events with a thumbnail URL for each requested slide, in slide order.
+
+    Cached thumbnails are announced immediately. The first uncached slide is converted on
+    its own so it shows up as early as possible; the remaining uncached slides share a
+    second conversion and are rasterized and announced one page at a time.
+    """
+    try:
+        pptx_path = os.path.join(work_dir, "presentation.pptx")
+        entries = await asyncio.to_thread(plan_previews, pptx_path, request.first, request.last)
+        cached = [
+            await asyncio.to_thread(image_cache.get_image, thumbnail_cache_key(slide_hash, request.width, request.format))
+            is not None
+            for _, slide_hash in entries
+        ]
+        missing = [position for position, hit in enumerate(cached) if not hit]
+        batches = [missing[:1], missing[1:]]
+        pages = {}
+        for position, (index, slide_hash) in enumerate(entries):
+            if not cached[position]:
+                if position not in pages:
+                    batch = next(batch for batch in batches if position in batch)
+                    # One PDF page per slide of the batch, in order
+                    subset_path = await asyncio.to_thread(
+                        write_slide_subset, pptx_path, [entries[p][0] for p in batch], work_dir, f"preview-{batch[0]}"
+                    )
+                    pdf_path = await convert_pptx_to_pdf(subset_path, work_dir)
+                    pages.update({p: (pdf_path, page) for page, p in enumerate(batch, start=1)})
+                pdf_path, page = pages[position]
+                data = await asyncio.to_thread(rasterize_pdf_page, pdf_path, page, request.width, request.format)
+                await asyncio.to_thread(
+                    image_cache.put_image, thumbnail_cache_key(slide_hash, request.width, request.format), data
+                )
+            yield json.dumps({
+                "event": "slide",
+                "index": index,
+                "url": f"/previews/{slide_hash}.{request.format}?width={request.width}",
+                "cached": cached[position],
+            }) + "\n"
+        yield json.dumps({"event": "done", "count": len(entries), "rendered": len(missing)}) + "\n"
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        logger.error(f"Error rendering previews: {detail}")
+        yield json.dumps({"event": "error", "detail": detail}) + "\n"
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    """A unit of background work with its stage progress, per-stage timings and result."""
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.stage = None
+        self.stages = {}
+        self.error = None
+        self.result_path = None
+        self.media_type = None
+        self.filename = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.version = 0
+        self._stage_started = None
+        self._lock = threading.Lock()
+        self._waiters = set()
+
+    def set_stage(self, stage):
+        with self._lock:
+            self._close_stage()
+            self.status = "running"
+            self.stage = stage
+            self._stage_started = time.monotonic()
+            self._notify()
+
+    def finish(self, result_path=None, media_type=None, filename=None, error=None):
+        with self._lock:
+            self._close_stage()
+            self.status = "failed" if error else "completed"
+            self.result_path = result_path
+            self.media_type = media_type
+            self.filename = filename
+            self.error = error
+            self.finished_at = time.time()
+            self._notify()
+
+    def _close_stage(self):
+        if self.stage and self._stage_started is not None:
+            self.stages[self.stage] = round(time.monotonic() - self._stage_started, 3)
+        self._stage_started = None
+
+    def _notify(self):
+        self.version += 1
+        # Waiters may sit on another event loop than the one updating the job
+        for loop, changed in self._waiters:
+            loop.call_soon_threadsafe(changed.set)
+
+    async def wait_for_change(self, seen_version, timeout):
+        """Waits, without holding a thread, until the job changes past ``seen_version``; returns the current version."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            if self.version != seen_version:
+                return self.version
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+        return self.version
+
+    @property
+    def done(self):
+        return self.status in ("completed", "failed")
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "stage": self.stage,
+                "stage_timings": dict(self.stages),
+                "error": self.error,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """Runs jobs as tasks on the event loop, ``workers`` at a time, and keeps their results for ``result_ttl`` seconds."""
+
+    def __init__(self, workers, max_queue, result_ttl):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self._slots = None
+        self._loop = None
+        self._tasks = set()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self._stage_totals = {}
+
+    def submit(self, kind, func, *args):
+        """Queues the coroutine ``func(*args, progress=...)``, which must return (stream, media_type, filename).
+
+        Must be called on the event loop that runs the jobs.
+        """
+        self._purge_expired()
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.workers)
+            self._loop = loop
+        with self._lock:
+            if self.queued >= self.max_queue:
+                raise JobQueueFull("Job queue is full, please retry later")
+            job = Job(kind)
+            self._jobs[job.id] = job
+            self.queued += 1
+        task = loop.create_task(self._run(job, func, args))
+        # The loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def track(self, kind):
+        """Registers a job run by the caller (e.g. a streaming endpoint) so its result can be fetched later."""
+        self._purge_expired()
+        job = Job(kind)
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    async def _run(self, job, func, args):
+        async with self._slots:
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+            try:
+                # Runners return either an open result file or the path of one they hand over
+                result, media_type, filename = await func(*args, progress=job.set_stage)
+                result_path = result if isinstance(result, str) else await asyncio.to_thread(write_result_file, result)
+                job.finish(result_path=result_path, media_type=media_type, filename=filename)
+            except HTTPException as e:
+                job.finish(error=str(e.detail))
+            except Exception as e:
+                logger.error(f"Error in {job.kind} job {job.id}: {e}")
+                job.finish(error=str(e))
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    for stage, duration in job.stages.items():
+                        total = self._stage_totals.setdefault(stage, {"count": 0, "seconds": 0.0})
+                        total["count"] += 1
+                        total["seconds"] += duration
+
+    def shutdown(self):
+        """Cancels queued and running jobs (on application shutdown)."""
+        for task in list(self._tasks):
+            task.cancel()
+
+    def get(self, job_id):
+        self._purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]
+            for job_id in expired:
+                job = self._jobs.pop(job_id)
+                if job.result_path:
+                    remove_file(job.result_path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self.queued,
+                "running": self.running,
+                "stored": len(self._jobs),
+                "stage_avg_seconds": {
+                    stage: round(total["seconds"] / total["count"], 3)
+                    for stage, total in self._stage_totals.items()
+                },
+            }
+
+
+job_manager = JobManager(JOB_WORKERS, JOB_QUEUE_MAX, JOB_RESULT_TTL)
+
+async def run_generate_slide_job(request, progress):
+    pptx_io = await build_deck_from_content(request.content, progress, not request.regenerate)
+    return pptx_io, PPTX_MEDIA_TYPE, "slidex_presentation.pptx"
+
+async def run_generate_slide_with_template_job(request, session, progress):
+    pptx_io = await build_deck_from_outlines(request, session, progress)
+    return pptx_io, PPTX_MEDIA_TYPE, f"{request.title}.pptx"
+
+async def run_convert_to_pdf_job(file_url, progress):
+    work_dir = tempfile.mkdtemp(prefix="slidex-")
+    try:
+        pdf_path = claim_result_file(await fetch_and_convert_to_pdf(file_url, work_dir, progress))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return pdf_path, "application/pdf", "presentation.pdf"
+
+def submit_job(kind, func, *args):
+    """Submits a job and returns the 202 payload, or raises a 503 when the queue is full."""
+    try:
+        job = job_manager.submit(kind, func, *args)
+    except JobQueueFull as e:
+        raise Overloaded(str(e))
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+        "result_url": f"/jobs/{job.id}/result",
+    }
+
+def get_job_or_404(job_id):
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+async def job_event_stream(job):
+    """Yields Server-Sent Events for each job update until the job finishes."""
+    version = -1
+    while True:
+        new_version = await job.wait_for_change(version, timeout=15)
+        if new_version == version:
+            yield ": keep-alive\n\n"
+            continue
+        version = new_version
+        yield f"event: progress\ndata: {json.dumps(job.to_dict())}\n\n"
+        if job.done:
+            break
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Unseekable sink for zipfile that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def batch_item_filename(index, request):
+    safe_title = re.sub(r"[^\w\- ]+", "", request.title).strip() or "presentation"
+    return f"{index + 1:03d}-{safe_title}.pptx"
+
+async def stream_batch_zip(items):
+    """Builds every batch item concurrently and yields a zip archive as the decks complete.
+
+    At most BATCH_CONCURRENCY decks build at once, and every deck in flight is accounted in
+    the generation admission gate: the first uses the slot the request was admitted with,
+    each further one takes a slot of its own. When the gate has no room for another deck,
+    the item waits for the batch's own slot instead, so a loaded server degrades the batch
+    to one deck at a time rather than failing items. Image downloads are shared across the
+    batch, and templates come from the shared pool and catalog. Each item runs in the deck
+    session given by its ``sessionId`` (or a new one), reported in the manifest. A failing
+    item does not affect the others; every item's outcome is recorded in manifest.json at
+    the end of the archive. Closing the stream (e.g. a client disconnect) cancels the decks still building.
+    """
+    gate = admission_gates["generation"]
+    image_fetches = SharedImageFetches()
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    own_slot = asyncio.Semaphore(1)
+    sessions = [None] * len(items)
+
+    async def build_item(index, item):
+        try:
+            sessions[index] = deck_sessions.open(item.sessionId, resolve_template_path(item.templateId))
+            return index, await build_deck_from_outlines(item, sessions[index], image_fetches=image_fetches), None
+        except Exception as e:
+            return index, None, e
+
+    async def build(index, item):
+        async with slots:
+            if own_slot.locked():
+                try:
+                    await gate.acquire()
+                except Overloaded:
+                    pass
+                else:
+                    try:
+                        return await build_item(index, item)
+                    finally:
+                        gate.release()
+            async with own_slot:
+                return await build_item(index, item)
+
+    tasks = [asyncio.create_task(build(index, item)) for index, item in enumerate(items)]
+    buffer = _ZipStreamBuffer()
+    manifest = [None] * len(items)
+    try:
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+            for completed in asyncio.as_completed(tasks):
+                index, pptx_io, e = await completed
+                if e is not None:
+                    error = e.detail if isinstance(e, HTTPException) else str(e)
+                    logger.error(f"Error in batch item {index + 1}: {error}")
+                    manifest[index] = {"index": index, "title": items[index].title, "status": "failed", "error": error}
+                    continue
+                filename = batch_item_filename(index, items[index])
+                with pptx_io, archive.open(filename, "w") as entry:
+                    while chunk := await asyncio.to_thread(pptx_io.read, FILE_CHUNK_SIZE):
+                        entry.write(chunk)
+                        yield buffer.drain()
+                manifest[index] = {
+                    "index": index, "title": items[index].title, "status": "completed", "file": filename,
+                    "session_id": sessions[index].id,
+                }
+                yield buffer.drain()
+            archive.writestr("manifest.json", json.dumps({"items": manifest}, indent=2))
+        yield buffer.drain()
+    finally:
+        for task in tasks:
+            task.cancel()
+        image_fetches.close()
+
+async def run_batch_item_job(request, session, image_fetches, progress):
+    pptx_io = await build_deck_from_outlines(request, session, progress, image_fetches)
+    return pptx_io, PPTX_MEDIA_TYPE, f"{request.title}.pptx"
+
 class SlideRequest(BaseModel):
     content: str
+    regenerate: bool = False  # bypass the LLM response cache
 
 class SlideRequestWithTemplate(BaseModel):
     title: str
     outlines: list
     templateId: str
     language: str = "english"
+    configMode: str | None = None  # "single" or "fanout"; defaults to CONFIG_MODE
+    regenerate: bool = False  # bypass the LLM response cache
+    sessionId: str | None = None  # deck session of a previous fan-out generation; only edited slides are regenerated
+
+class BatchRequest(BaseModel):
+    items: list[SlideRequestWithTemplate]
+    mode: str = "zip"  # "zip" streams one archive; "jobs" returns a job handle per item
 
 class ConversionRequest(BaseModel):
     file_url: str
 
 
+class PreviewRequest(BaseModel):
+    file_url: str | None = None  # PPTX to preview; alternatively the id of a finished deck job
+    job_id: str | None = None
+    first: int = 1  # 1-based, inclusive slide range
+    last: int | None = None
+    width: int = 320  # one of PREVIEW_WIDTHS
+    format: str = "webp"  # "webp" or "png"
+
 class OutlineRequest(BaseModel):
     prompt: str
     slideCount: int
     language: str
+    regenerate: bool = False  # bypass the LLM response cache
+
+
+
+class StartupState:
+    """Warm-up progress and per-phase startup timings, reported by /ready."""
+
+    def __init__(self):
+        self.ready = False
+        self.error = None
+        self.timings = {}
+
+    def record(self, phase, seconds):
+        self.timings[phase] = round(seconds, 3)
+        if STARTUP_PROFILE:
+            logger.info(f"Startup phase {phase}: {seconds:.3f}s")
+
+    async def run_phase(self, phase, func):
+        """Runs the blocking ``func`` in a thread as one timed phase, profiling it in STARTUP_PROFILE mode."""
+        started = time.perf_counter()
+        if STARTUP_PROFILE:
+            profiler = cProfile.Profile()
+            await asyncio.to_thread(profiler.runcall, func)
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(10)
+            logger.info(f"Startup phase {phase} profile:\n{report.getvalue()}")
+        else:
+            await asyncio.to_thread(func)
+        self.record(phase, time.perf_counter() - started)
+
+
+startup = StartupState()
+
+
+def warm_templates():
+    template_catalog.warm()
+    for template_path in TEMPLATE_PATHS.values():
+        if os.path.exists(template_path):
+            template_pool.get_bytes(template_path)
+
+
+def warm_libreoffice():
+    if check_libreoffice_installed():
+        libreoffice_pool.start()
+    else:
+        logger.warning("LibreOffice is not installed; PDF conversion is unavailable")
+
+
+def warm_clients():
+    # Import the SDKs off the event loop, so opening the clients afterwards costs no import time
+    for module in ("httpx", "openai"):
+        importlib.import_module(module)
+
+
+async def warm_up():
+    """Preloads everything the first request would otherwise pay for, then marks the instance ready."""
+    started = time.perf_counter()
+    try:
+        await startup.run_phase("clients", warm_clients)
+        open_async_clients()
+        await startup.run_phase("templates", warm_templates)
+        await startup.run_phase("libreoffice", warm_libreoffice)
+        if PPTX_BUILD_BACKEND == "process":
+            await startup.run_phase("build_pool", pptx_build_pool.start)
+    except Exception as e:
+        logger.error(f"Warm-up failed: {e}")
+        startup.error = str(e)
+        return
+    startup.record("warm_up", time.perf_counter() - started)
+    startup.ready = True
+    logger.info(f"Warm-up complete in {time.perf_counter() - started:.2f}s; ready for traffic")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm-up runs in the background so /live answers at once; /ready turns 200 once it is done
+    warm_up_task = asyncio.create_task(warm_up())
+    try:
+        yield
+    finally:
+        warm_up_task.cancel()
+        job_manager.shutdown()
+        await close_async_clients()
+        libreoffice_pool.shutdown()
+        pptx_build_pool.shutdown()
 
 
+app = FastAPI(title="Slide Generator API", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def admit_requests(request: Request, call_next):
+    """Runs expensive endpoints through their admission gate, holding the slot until the response is sent."""
+    gate_name = ADMISSION_ROUTES.get(request.url.path) if request.method == "POST" else None
+    if gate_name is None:
+        return await call_next(request)
+    gate = admission_gates[gate_name]
+    try:
+        await gate.acquire()
+    except Overloaded as e:
+        return JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+    try:
+        response = await call_next(request)
+    except BaseException:
+        gate.release()
+        raise
+    body = response.body_iterator
+
+    async def release_after_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            gate.release()
+
+    response.body_iterator = release_after_body()
+    return response
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Assigns each request a trace id and records its latency by route template."""
+    trace_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16]
+    token = current_trace_id.set(trace_id)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = trace_id
+        return response
+    finally:
+        current_trace_id.reset(token)
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.observe("slidex_http_request_duration_seconds", time.perf_counter() - started, route=path, method=request.method)
+        metrics.inc("slidex_http_requests_total", route=path, method=request.method, status=status)
 
-app = FastAPI(title="Slide Generator API")
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], 
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Deck-Session-ID"],
 )
+
+@app.get("/live")
+def api_live():
+    return {"status": "alive"}
+
+
+@app.get("/ready")
+def api_ready():
+    body = {"status": "ready" if startup.ready else "warming_up", "error": startup.error, "startup": startup.timings}
+    return JSONResponse(body, status_code=200 if startup.ready else 503)
+
+
+@app.get("/conversion_pool")
+def api_conversion_pool():
+    return libreoffice_pool.stats()
+
+
+@app.get("/admission")
+def api_admission():
+    return {name: gate.stats() for name, gate in admission_gates.items()}
+
+
+@app.get("/templates")
+def api_templates():
+    return {
+        "templates": template_catalog.list_templates(),
+        "cache": template_catalog.stats(),
+        "pool": template_pool.stats(),
+        "images": image_cache.stats(),
+    }
+
+
+@app.get("/llm_cache")
+def api_llm_cache():
+    return llm_cache.stats()
+
+
+def component_stat_samples():
+    """Exposes the numeric fields of each component's stats() as gauges, e.g. slidex_llm_cache_hits."""
+    components = {
+        "template_catalog": template_catalog.stats,
+        "template_pool": template_pool.stats,
+        "image_cache": image_cache.stats,
+        "llm_cache": llm_cache.stats,
+        "conversion_pool": libreoffice_pool.stats,
+        "jobs": job_manager.stats,
+        "deck_sessions": deck_sessions.stats,
+        **{f"admission_{name}": gate.stats for name, gate in admission_gates.items()},
+    }
+    samples = []
+    for component, stats in components.items():
+        for key, value in stats().items():
+            if isinstance(value, (int, float)):
+                samples.append((f"slidex_{component}_{key}", {}, float(value)))
+    return samples
+
+metrics.add_collector(component_stat_samples)
+
+
+@app.get("/metrics")
+def api_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/template_structure")
 def api_template_structure():
     try:
-        struct = get_template_structure(DEFAULT_TEMPLATE_PATH)
+        struct = template_catalog.get_structure(DEFAULT_TEMPLATE_PATH)
         return struct
     except Exception as e:
         logger.error(f"Error in template_structure API: {e}")
@@ -422,14 +3466,16 @@ def api_template_structure():
 
 
 @app.post("/generate_outline")
-def api_generate_outline(request: OutlineRequest):
+async def api_generate_outline(request: OutlineRequest):
     try:
-        logger.info(f"Received outline generation request: {request.prompt}")
+        if payload_log_sampled():
+            logger.info(f"Received outline generation request: {request.prompt}")
         
-        outlines = generate_structured_outline(
+        outlines = await generate_structured_outline(
             prompt=request.prompt,
             slide_count=request.slideCount,
-            language=request.language
+            language=request.language,
+            use_cache=not request.regenerate
         )
         
         if not outlines:
@@ -449,20 +3495,34 @@ def api_generate_outline(request: OutlineRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/generate_outline/stream")
+async def api_generate_outline_stream(request: OutlineRequest):
+    async def events():
+        try:
+            count = 0
+            async for slide in stream_structured_outline(
+                prompt=request.prompt,
+                slide_count=request.slideCount,
+                language=request.language,
+                use_cache=not request.regenerate
+            ):
+                yield json.dumps({"event": "slide", "index": count, "slide": slide}) + "\n"
+                count += 1
+            yield json.dumps({"event": "done", "count": count}) + "\n"
+        except Exception as e:
+            logger.error(f"Error in streamed generate_outline: {e}")
+            yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 @app.post("/generate_slide")
-def api_generate_slide(request: SlideRequest):
-    try:
-        struct = get_template_structure(DEFAULT_TEMPLATE_PATH)
-        outline = generate_content_outline(request.content)
-        if not outline:
-            raise HTTPException(status_code=400, detail="Failed to generate content outline")
-        config = generate_presentation_config(outline, struct)
-        if not config:
-            raise HTTPException(status_code=400, detail="Failed to generate presentation config")
-        pptx_io = generate_pptx_from_config(DEFAULT_TEMPLATE_PATH, config)
+async def api_generate_slide(request: SlideRequest):
+    try:
+        pptx_io = await build_deck_from_content(request.content, use_cache=not request.regenerate)
         return StreamingResponse(
-            pptx_io,
-            media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+            iter_file(pptx_io),
+            media_type=PPTX_MEDIA_TYPE,
             headers={"Content-Disposition": "attachment; filename=slidex_presentation.pptx"}
         )
     except HTTPException:
@@ -472,51 +3532,19 @@ def api_generate_slide(request: SlideRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/generate_slide_with_template")
-def api_generate_slide_with_template(request: SlideRequestWithTemplate):
+async def api_generate_slide_with_template(request: SlideRequestWithTemplate):
     try:
-        # Debug: Log the received outlines
-        logger.info(f"🔍 Received request for template: {request.templateId}")
-        logger.info(f"📝 Total slides received: {len(request.outlines)}")
-        for i, outline in enumerate(request.outlines):
-            logger.info(f"📄 Slide {i + 1}: '{outline.get('title', 'Untitled')}' - {len(outline.get('content', []))} points")
-            logger.info(f"   Content: {outline.get('content', [])}")
-        
-        # Get template path
-        template_path = TEMPLATE_PATHS.get(request.templateId)
-        if not template_path:
-            raise HTTPException(status_code=400, detail=f"Template '{request.templateId}' not found")
-        
-        # Check if template file exists
-        if not os.path.exists(template_path):
-            raise HTTPException(status_code=400, detail=f"Template file '{template_path}' not found")
-        
-        # Get template structure
-        struct = get_template_structure(template_path)
-        
-        # Convert outlines to content string
-        content_parts = []
-        for outline in request.outlines:
-            content_parts.append(f"Slide: {outline.get('title', 'Untitled')}")
-            for content_item in outline.get('content', []):
-                content_parts.append(f"- {content_item}")
-            content_parts.append("")  # Empty line between slides
-        
-        content_string = "\n".join(content_parts)
-        logger.info(f"📋 Generated content string:\n{content_string}")
-        
-        # Generate presentation config using AI
-        config = generate_presentation_config(content_string, struct)
-        if not config:
-            raise HTTPException(status_code=400, detail="Failed to generate presentation config")
-        
-        # Generate PPTX file
-        pptx_io = generate_pptx_from_config(template_path, config)
+        session = deck_sessions.open(request.sessionId, resolve_template_path(request.templateId))
+        pptx_io = await build_deck_from_outlines(request, session)
         
         # Return as streaming response
         return StreamingResponse(
-            pptx_io,
-            media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-            headers={"Content-Disposition": f'attachment; filename="{request.title}.pptx"'}
+            iter_file(pptx_io),
+            media_type=PPTX_MEDIA_TYPE,
+            headers={
+                "Content-Disposition": f'attachment; filename="{request.title}.pptx"',
+                "X-Deck-Session-ID": session.id,
+            }
         )
         
     except HTTPException:
@@ -525,22 +3553,153 @@ def api_generate_slide_with_template(request: SlideRequestWithTemplate):
         logger.error(f"Error in generate_slide_with_template API: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/generate_slide_with_template/stream")
+async def api_generate_slide_with_template_stream(request: SlideRequestWithTemplate):
+    session = deck_sessions.open(request.sessionId, resolve_template_path(request.templateId))
+    job = job_manager.track("generate_slide_with_template")
+    return StreamingResponse(
+        stream_deck_from_outlines(request, session, job),
+        media_type="application/x-ndjson",
+        headers={"X-Deck-Session-ID": session.id}
+    )
+
+@app.post("/generate_batch")
+async def api_generate_batch(request: BatchRequest):
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Batch has no items")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+
+    if request.mode == "zip":
+        return StreamingResponse(
+            stream_batch_zip(request.items),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="slidex_batch.zip"'}
+        )
+    if request.mode != "jobs":
+        raise HTTPException(status_code=400, detail=f"Unknown batch mode '{request.mode}'")
+
+    # The shared fetches live as long as any of the batch's jobs still references them
+    image_fetches = SharedImageFetches()
+    results = []
+    for index, item in enumerate(request.items):
+        try:
+            session = deck_sessions.open(item.sessionId, resolve_template_path(item.templateId))
+            submitted = submit_job("generate_slide_with_template", run_batch_item_job, item, session, image_fetches)
+            results.append({"index": index, **submitted, "session_id": session.id})
+        except HTTPException as e:
+            results.append({"index": index, "status": "rejected", "error": e.detail})
+    return {"items": results}
+
 @app.post("/convert_to_pdf")
-def api_convert_to_pdf(request: ConversionRequest):
+async def api_convert_to_pdf(request: ConversionRequest):
+    work_dir = tempfile.mkdtemp(prefix="slidex-")
     try:
-        response = requests.get(request.file_url)
-        if response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to fetch PPTX file")
-
-        pptx_stream = io.BytesIO(response.content)
-        pdf_io = convert_pptx_to_pdf(pptx_stream)
+        pdf_path = await fetch_and_convert_to_pdf(request.file_url, work_dir)
         
-        return StreamingResponse(
-            pdf_io,
+        # Served from disk; the scratch directory is removed once the response is sent
+        return FileResponse(
+            pdf_path,
             media_type="application/pdf",
-            headers={"Content-Disposition": 'attachment; filename="presentation.pdf"'}
+            filename="presentation.pdf",
+            background=BackgroundTask(shutil.rmtree, work_dir, ignore_errors=True)
         )
             
+    except HTTPException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
     except Exception as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
         logger.error(f"Error converting to PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/preview")
+async def api_preview(request: PreviewRequest):
+    if request.format not in PREVIEW_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown preview format '{request.format}'")
+    if request.width not in PREVIEW_WIDTHS:
+        raise HTTPException(status_code=400, detail=f"Preview width must be one of {PREVIEW_WIDTHS}")
+    if not request.file_url and not request.job_id:
+        raise HTTPException(status_code=400, detail="Either file_url or job_id is required")
+    if not check_libreoffice_installed() or not check_pdftoppm_installed():
+        raise HTTPException(status_code=503, detail="Preview rendering requires LibreOffice and pdftoppm (poppler-utils)")
+
+    work_dir = tempfile.mkdtemp(prefix="slidex-preview-")
+    try:
+        pptx_path = os.path.join(work_dir, "presentation.pptx")
+        if request.job_id:
+            job = get_job_or_404(request.job_id)
+            if job.status != "completed" or job.media_type != PPTX_MEDIA_TYPE:
+                raise HTTPException(status_code=409, detail=f"Job '{request.job_id}' has no finished presentation")
+            await asyncio.to_thread(shutil.copyfile, job.result_path, pptx_path)
+        else:
+            await download_to_file(request.file_url, pptx_path)
+    except Exception:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+    return StreamingResponse(
+        stream_previews(request, work_dir),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(shutil.rmtree, work_dir, ignore_errors=True)
+    )
+
+@app.get("/previews/{slide_hash}.{image_format}")
+async def api_preview_image(slide_hash: str, image_format: str, width: int = 320):
+    if image_format not in PREVIEW_MEDIA_TYPES:
+        raise HTTPException(status_code=404, detail="Preview not found")
+    data = await asyncio.to_thread(image_cache.get_image, thumbnail_cache_key(slide_hash, width, image_format))
+    if data is None:
+        raise HTTPException(status_code=404, detail="Preview not found")
+    # Keys are content hashes, so a thumbnail never changes once rendered
+    return Response(
+        data, media_type=PREVIEW_MEDIA_TYPES[image_format],
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+
+@app.post("/jobs/generate_slide", status_code=202)
+async def api_submit_generate_slide(request: SlideRequest):
+    return submit_job("generate_slide", run_generate_slide_job, request)
+
+@app.post("/jobs/generate_slide_with_template", status_code=202)
+async def api_submit_generate_slide_with_template(request: SlideRequestWithTemplate):
+    # Reject unknown templates up front rather than after queueing
+    session = deck_sessions.open(request.sessionId, resolve_template_path(request.templateId))
+    return {
+        **submit_job("generate_slide_with_template", run_generate_slide_with_template_job, request, session),
+        "session_id": session.id,
+    }
+
+@app.post("/jobs/convert_to_pdf", status_code=202)
+async def api_submit_convert_to_pdf(request: ConversionRequest):
+    return submit_job("convert_to_pdf", run_convert_to_pdf_job, request.file_url)
+
+@app.get("/jobs")
+def api_jobs():
+    return job_manager.stats()
+
+@app.get("/jobs/{job_id}")
+def api_job_status(job_id: str):
+    return get_job_or_404(job_id).to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def api_job_events(job_id: str):
+    job = get_job_or_404(job_id)
+    return StreamingResponse(
+        job_event_stream(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/jobs/{job_id}/result")
+def api_job_result(job_id: str):
+    job = get_job_or_404(job_id)
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if not job.done:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' is still {job.status}")
+    return FileResponse(job.result_path, media_type=job.media_type, filename=job.filename)
+
+startup.record("import", time.perf_counter() - _import_started)